@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from peft import PeftModel
+
+from result_cache import adapter_fingerprint
+
+DEFAULT_ADAPTER = "default"
+
+class AdapterError(ValueError):
+    pass
+
+def adapter_base_model(path: str) -> Optional[str]:
+    config_path = os.path.join(path, "adapter_config.json")
+    if not os.path.exists(config_path):
+        return None
+    with open(config_path) as f:
+        return json.load(f).get("base_model_name_or_path")
+
+class AdapterRegistry:
+    """Serves several LoRA adapters from one resident base model.
+
+    The adapter the model was loaded with is ``default`` and always stays
+    resident. Others are loaded on first use and the least recently used one
+    is deleted once more than ``max_loaded`` adapters are in memory.
+    ``activate`` must run on the generation thread, right before generate.
+    Each adapter's files are fingerprinted when its weights are (re)loaded, so
+    request paths never stat them.
+    """
+
+    def __init__(self, model, default_path: str, adapters: Dict[str, str], max_loaded: int = 4):
+        self.model = model
+        self.paths = {DEFAULT_ADAPTER: default_path, **adapters}
+        self.max_loaded = max(1, max_loaded)
+        self.stats = {"loads": 0, "evictions": 0, "swaps": 0}
+        self._loaded = OrderedDict([(DEFAULT_ADAPTER, True)])
+        self._active = DEFAULT_ADAPTER
+        self._checked = {DEFAULT_ADAPTER}
+        self.fingerprints = {name: adapter_fingerprint(path) for name, path in self.paths.items() if path}
+        self._lock = threading.Lock()
+
+    def resolve(self, name: Optional[str]) -> str:
+        # Called on the request path so bad names fail before they reach the queue
+        name = name or DEFAULT_ADAPTER
+        if name not in self.paths:
+            raise AdapterError(f"unknown adapter '{name}', expected one of {', '.join(self.paths)}")
+        if name in self._checked:
+            return name
+        if not isinstance(self.model, PeftModel):
+            # Merged and cpu-int8 models have no LoRA layers left to swap
+            raise AdapterError(f"adapter '{name}' is unavailable, the served model has its adapter merged in")
+
+        # A LoRA only applies to the base model it was trained on
+        base = self.model.peft_config[DEFAULT_ADAPTER].base_model_name_or_path
+        trained_on = adapter_base_model(self.paths[name])
+        if trained_on is None:
+            raise AdapterError(f"adapter '{name}' has no adapter_config.json at {self.paths[name]}")
+        if base and trained_on != base:
+            raise AdapterError(f"adapter '{name}' was trained on {trained_on}, but the server runs {base}")
+        self._checked.add(name)
+        return name
+
+    def activate(self, name: str):
+        with self._lock:
+            if name not in self._loaded:
+                print(f"Loading adapter '{name}' from {self.paths[name]}")
+                self.model.load_adapter(self.paths[name], adapter_name=name)
+                self.fingerprints[name] = adapter_fingerprint(self.paths[name])
+                self._loaded[name] = True
+                self.stats["loads"] += 1
+            self._loaded.move_to_end(name)
+
+            if name != self._active:
+                self.model.set_adapter(name)
+                self._active = name
+                self.stats["swaps"] += 1
+
+            # The default and the active adapter are never evicted
+            evictable = [key for key in self._loaded if key not in (DEFAULT_ADAPTER, self._active)]
+            while len(self._loaded) > self.max_loaded and evictable:
+                evicted = evictable.pop(0)
+                self.model.delete_adapter(evicted)
+                del self._loaded[evicted]
+                self.stats["evictions"] += 1
+
+    def info(self) -> dict:
+        return {
+            **self.stats,
+            "active": self._active,
+            "loaded": list(self._loaded),
+            "available": list(self.paths),
+            "max_loaded": self.max_loaded,
+        }
@@ -0,0 +1,98 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import time
+
+from generation import SCHEMA, build_prompt, generate_batch
+from model_loading import PRECISIONS, load_model
+from schema_linker import introspect, render_schema
+from stopping import DECODE_STATS, token_budget
+
+def read_questions(path: str) -> list:
+    # JSONL or CSV with a "question" field and an optional "id"
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    return [{"id": str(row.get("id") or index), "question": row["question"]} for index, row in enumerate(rows)]
+
+def completed_ids(path: str) -> set:
+    """Ids already in the output file; a line cut off by a crash is dropped."""
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    valid_bytes = 0
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["id"])
+            except (ValueError, KeyError):
+                break
+            valid_bytes += len(line)
+    with open(path, "r+b") as f:
+        f.truncate(valid_bytes)
+    return done
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate SQL for a file of questions in length-sorted batches")
+    parser.add_argument("--input", required=True, help="questions as .jsonl or .csv")
+    parser.add_argument("--output", required=True, help="results as .jsonl, also the resume checkpoint")
+    parser.add_argument("--model", default="meta-llama/Llama-3.2-3B-Instruct")
+    parser.add_argument("--adapter", default="../sql-assistant-final", help="'none' for merged checkpoints")
+    parser.add_argument("--precision", default="fp16", choices=PRECISIONS)
+    parser.add_argument("--device", default="auto")
+    parser.add_argument("--db", help="introspect this database for the prompt schema instead of sample.db's")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--greedy", action="store_true", help="deterministic output instead of the server's sampling")
+    args = parser.parse_args()
+
+    schema = SCHEMA
+    if args.db:
+        schema = render_schema(introspect(sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)))
+
+    questions = read_questions(args.input)
+    done = completed_ids(args.output)
+    pending = [item for item in questions if item["id"] not in done]
+    print(f"{len(questions)} questions, {len(done)} already done, {len(pending)} to generate")
+    if not pending:
+        return
+
+    adapter = None if args.adapter == "none" else args.adapter
+    model, tokenizer, info = load_model(args.model, adapter, args.precision, args.device)
+    print(f"Loaded {args.precision} model on {info['device']} in {info['load_seconds']}s")
+
+    # Similar lengths share a batch, so left padding stays short
+    for item in pending:
+        item["length"] = len(tokenizer(item["question"], add_special_tokens=False).input_ids)
+    pending.sort(key=lambda item: item["length"])
+
+    generation_kwargs = {"do_sample": False} if args.greedy else {}
+    start = time.perf_counter()
+    tokens_before = DECODE_STATS["tokens_generated"]
+    finished = 0
+    with open(args.output, "a") as out:
+        for offset in range(0, len(pending), args.batch_size):
+            batch = pending[offset:offset + args.batch_size]
+            prompts = [build_prompt(item["question"], schema) for item in batch]
+            budgets = [token_budget(item["question"]) for item in batch]
+            queries = generate_batch(prompts, model, tokenizer, budgets, **generation_kwargs)
+
+            for item, query in zip(batch, queries):
+                out.write(json.dumps({"id": item["id"], "question": item["question"], "sql_query": query}) + "\n")
+            # Everything written so far survives a crash
+            out.flush()
+            os.fsync(out.fileno())
+
+            finished += len(batch)
+            elapsed = time.perf_counter() - start
+            tokens = DECODE_STATS["tokens_generated"] - tokens_before
+            print(
+                f"{len(done) + finished}/{len(questions)} questions, "
+                f"{finished / elapsed:.2f} questions/s, {tokens / elapsed:.1f} tokens/s"
+            )
+
+if __name__ == "__main__":
+    main()
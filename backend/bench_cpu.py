@@ -0,0 +1,39 @@
+import argparse
+
+import torch
+
+from generation import build_prompt
+from model_loading import CPU_DTYPES, configure_cpu, load_model, measure_throughput
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU decode throughput per thread count, dtype and torch.compile")
+    parser.add_argument("--model", default="hf-internal-testing/tiny-random-LlamaForCausalLM")
+    parser.add_argument("--adapter", default=None)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, torch.get_num_threads()])
+    parser.add_argument("--dtypes", nargs="+", default=["float32", "bfloat16", "int8"], choices=[*CPU_DTYPES, "int8"])
+    parser.add_argument("--compile", action="store_true", help="also time a torch.compile'd forward")
+    parser.add_argument("--new-tokens", type=int, default=32)
+    args = parser.parse_args()
+
+    prompt = build_prompt("Show the average grade per team")
+    compile_modes = [False, True] if args.compile else [False]
+    print(f"{'dtype':<9} {'compile':>7} {'threads':>7} {'load s':>7} {'weights MB':>11} {'tokens/s':>9}")
+    for dtype in args.dtypes:
+        for compile in compile_modes:
+            if dtype == "int8":
+                model, tokenizer, info = load_model(args.model, args.adapter, "cpu-int8", compile=compile)
+            else:
+                model, tokenizer, info = load_model(args.model, args.adapter, "fp16", "cpu", dtype, compile)
+            for threads in sorted(set(args.threads)):
+                configure_cpu(threads)
+                # Warm-up, and for compiled models the compile itself
+                measure_throughput(model, tokenizer, prompt, 4)
+                tokens_per_second = measure_throughput(model, tokenizer, prompt, args.new_tokens)
+                print(
+                    f"{dtype:<9} {str(compile):>7} {threads:>7} {info['load_seconds']:>7.1f} "
+                    f"{info['footprint_mb']:>11.1f} {tokens_per_second:>9.1f}"
+                )
+            del model
+
+if __name__ == "__main__":
+    main()
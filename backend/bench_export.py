@@ -0,0 +1,96 @@
+import argparse
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi.encoders import jsonable_encoder
+
+from database import ConnectionPool, load_schema
+from export import arrow_stream, declared_types, first_batch, parquet_bytes
+
+def build_database(path: str, rows: int):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        DROP TABLE IF EXISTS TimeEntries;
+        CREATE TABLE TimeEntries (
+            entry_id INTEGER PRIMARY KEY,
+            student_id INTEGER NOT NULL,
+            hours INTEGER NOT NULL,
+            task_date DATE NOT NULL,
+            task_type TEXT NOT NULL
+        );
+    """)
+    conn.execute("""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO TimeEntries
+        SELECT i, i % 1000 + 1, i % 8 + 1, date('2024-01-01', '+' || (i % 60) || ' days'),
+               CASE i % 5 WHEN 0 THEN 'Development' WHEN 1 THEN 'Testing' WHEN 2 THEN 'Documentation'
+                          WHEN 3 THEN 'Meeting' ELSE 'Research' END
+        FROM n
+    """, (rows,))
+    conn.commit()
+    conn.close()
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def run_json(pool, sql):
+    # The current path: fetchall, FastAPI's encoder, then the client's JSON.parse
+    rows, fetch = timed(lambda: pool.fetch_all(sql))
+    body, encode = timed(lambda: json.dumps({"results": jsonable_encoder(rows)}).encode())
+    _, decode = timed(lambda: json.loads(body))
+    return fetch + encode, decode, len(body)
+
+def run_arrow(pool, sql, batch_size):
+    def encode():
+        types = pool.call(lambda conn: declared_types(sql, load_schema(conn)))
+        rows = pool.iter_rows(sql, batch_size=batch_size, max_rows=10 ** 9)
+        header = next(rows)
+        batches, first = first_batch(header["columns"], rows, types)
+        return b"".join(arrow_stream(batches, first, rows))
+    body, encode_time = timed(encode)
+    _, decode = timed(lambda: pa.ipc.open_stream(body).read_all())
+    return encode_time, decode, len(body)
+
+def run_parquet(pool, sql, batch_size):
+    def encode():
+        types = pool.call(lambda conn: declared_types(sql, load_schema(conn)))
+        rows = pool.iter_rows(sql, batch_size=batch_size, max_rows=10 ** 9)
+        header = next(rows)
+        return parquet_bytes(header["columns"], rows, types)[0]
+    body, encode_time = timed(encode)
+    _, decode = timed(lambda: pq.read_table(io.BytesIO(body)))
+    return encode_time, decode, len(body)
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON vs Arrow IPC vs Parquet result encoding")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    sql = "SELECT * FROM TimeEntries"
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        for rows in args.rows:
+            build_database(path, rows)
+            pool = ConnectionPool(path, size=2, timeout_ms=10 ** 7)
+            print(f"\n{rows:,} rows")
+            print(f"{'format':<8} {'server ms':>10} {'client ms':>10} {'size MB':>9}")
+            for name, run in (
+                ("json", lambda: run_json(pool, sql)),
+                ("arrow", lambda: run_arrow(pool, sql, args.batch_size)),
+                ("parquet", lambda: run_parquet(pool, sql, args.batch_size)),
+            ):
+                server, client, size = run()
+                print(f"{name:<8} {server * 1000:>10.0f} {client * 1000:>10.0f} {size / 1e6:>9.2f}")
+            pool.close()
+
+if __name__ == "__main__":
+    main()
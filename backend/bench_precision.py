@@ -0,0 +1,32 @@
+import argparse
+
+import torch
+
+from generation import build_prompt
+from model_loading import PRECISIONS, load_model, measure_throughput
+
+def main():
+    parser = argparse.ArgumentParser(description="Footprint, load time and tokens/sec per inference precision")
+    parser.add_argument("--model", default="meta-llama/Llama-3.2-3B-Instruct")
+    parser.add_argument("--adapter", default="../sql-assistant-final")
+    parser.add_argument("--precisions", nargs="+", default=list(PRECISIONS), choices=PRECISIONS)
+    parser.add_argument("--new-tokens", type=int, default=32)
+    args = parser.parse_args()
+
+    prompt = build_prompt("Show the average grade per team")
+    print(f"{'precision':<10} {'load s':>8} {'weights MB':>11} {'tokens/s':>9}")
+    for precision in args.precisions:
+        # bitsandbytes and fp16 kernels need a GPU
+        if precision != "cpu-int8" and not torch.cuda.is_available():
+            print(f"{precision:<10} skipped (no CUDA device)")
+            continue
+        model, tokenizer, info = load_model(args.model, args.adapter, precision)
+        measure_throughput(model, tokenizer, prompt, 4)  # warm-up
+        tokens_per_second = measure_throughput(model, tokenizer, prompt, args.new_tokens)
+        print(f"{precision:<10} {info['load_seconds']:>8.1f} {info['footprint_mb']:>11.1f} {tokens_per_second:>9.1f}")
+        del model
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+if __name__ == "__main__":
+    main()
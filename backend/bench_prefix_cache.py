@@ -0,0 +1,53 @@
+import argparse
+import statistics
+import time
+
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+
+from bench_scheduler import QUESTIONS
+from generation import build_prompt, generate_batch, prompt_prefix, question_suffix
+from prefix_cache import PrefixCache
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Time-to-first-token with and without the schema prefix cache")
+    parser.add_argument("--model", default="hf-internal-testing/tiny-random-LlamaForCausalLM")
+    parser.add_argument("--repeats", type=int, default=5)
+    return parser.parse_args()
+
+def time_first_token(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            fn(question)
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main():
+    args = parse_args()
+    print(f"Loading {args.model}...")
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForCausalLM.from_pretrained(args.model, torch_dtype=torch.float32)
+    model.eval()
+
+    # A single new token makes the generate call time prefill + first decode step
+    kwargs = {"max_new_tokens": 1, "do_sample": False, "temperature": None}
+    prefix = prompt_prefix()
+    cache = PrefixCache()
+    cache.generate_batch(prefix, [question_suffix(QUESTIONS[0])], model, tokenizer, **kwargs)
+
+    plain = time_first_token(lambda q: generate_batch([build_prompt(q)], model, tokenizer, **kwargs), args.repeats)
+    cached = time_first_token(
+        lambda q: cache.generate_batch(prefix, [question_suffix(q)], model, tokenizer, **kwargs), args.repeats
+    )
+
+    prefix_tokens = len(tokenizer(prefix).input_ids)
+    prompt_tokens = statistics.mean(len(tokenizer(build_prompt(q)).input_ids) for q in QUESTIONS)
+    print(f"Prompt: {prompt_tokens:.0f} tokens on average, {prefix_tokens} of them in the cached prefix")
+    print(f"TTFT without prefix cache: {plain:.1f} ms (median)")
+    print(f"TTFT with prefix cache:    {cached:.1f} ms (median)")
+    print(f"Speedup: {plain / cached:.2f}x")
+
+if __name__ == "__main__":
+    main()
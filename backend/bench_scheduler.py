@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import time
+
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+
+from generation import build_prompt, generate_batch
+from scheduler import BatchScheduler
+
+QUESTIONS = [
+    "List all students in the Alpha Team",
+    "What is the total budget of all projects?",
+    "How many hours did each student log?",
+    "Which project has the highest budget?",
+    "Show the average grade per team",
+    "List students enrolled after June 2023",
+    "How many time entries are of type Testing?",
+    "Which students work on the AI Research project?",
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serial vs batched /query throughput on a small CPU model")
+    parser.add_argument("--model", default="hf-internal-testing/tiny-random-LlamaForCausalLM")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=20.0)
+    return parser.parse_args()
+
+async def run_batched(scheduler, prompts):
+    return await asyncio.gather(*(scheduler.submit(prompt) for prompt in prompts))
+
+def main():
+    args = parse_args()
+    torch.manual_seed(0)
+
+    print(f"Loading {args.model}...")
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForCausalLM.from_pretrained(args.model, torch_dtype=torch.float32)
+    model.eval()
+
+    prompts = [build_prompt(QUESTIONS[i % len(QUESTIONS)]) for i in range(args.requests)]
+    # Force every request to decode the same number of tokens so the runs are comparable
+    kwargs = {"max_new_tokens": args.max_new_tokens, "min_new_tokens": args.max_new_tokens}
+
+    start = time.perf_counter()
+    for prompt in prompts:
+        generate_batch([prompt], model, tokenizer, **kwargs)
+    serial = time.perf_counter() - start
+
+    scheduler = BatchScheduler(
+        lambda batch: generate_batch(batch, model, tokenizer, **kwargs),
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+    )
+
+    async def batched_run():
+        try:
+            return await run_batched(scheduler, prompts)
+        finally:
+            await scheduler.stop()
+
+    start = time.perf_counter()
+    asyncio.run(batched_run())
+    batched = time.perf_counter() - start
+
+    print(f"{args.requests} concurrent requests, {args.max_new_tokens} new tokens each")
+    print(f"Serial:  {serial:.2f}s ({args.requests / serial:.2f} req/s)")
+    print(f"Batched: {batched:.2f}s ({args.requests / batched:.2f} req/s) "
+          f"in {scheduler.stats['batches']} batches, largest {scheduler.stats['largest_batch']}")
+    print(f"Speedup: {serial / batched:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import random
+import sqlite3
+
+import torch
+from transformers import AutoTokenizer
+
+from generation import SCHEMA, build_prompt, generate_batch
+from schema_linker import SchemaLinker, introspect, render_schema
+from stopping import token_budget
+
+# Questions with the tables a correct query needs
+LABELED_QUESTIONS = [
+    ("List all students in the Alpha Team", {"Students", "Teams"}),
+    ("What is the total budget of all projects?", {"Projects"}),
+    ("How many hours did each student log?", {"Students", "TimeEntries"}),
+    ("Which project has the highest budget?", {"Projects"}),
+    ("Show the average grade per team", {"Students", "Teams"}),
+    ("List students enrolled after June 2023", {"Students"}),
+    ("How many time entries are of type Testing?", {"TimeEntries"}),
+    ("Which students work on the AI Research project?", {"Students", "Projects"}),
+    ("Which team has the most projects?", {"Teams", "Students", "Projects"}),
+    ("How many hours did each team log?", {"Teams", "Students", "TimeEntries"}),
+    ("What is the budget of the project with the most students?", {"Projects", "Students"}),
+    ("Which department spends the most hours on Research tasks?", {"Projects", "Students", "TimeEntries"}),
+]
+
+DOMAINS = ["Invoice", "Shipment", "Vendor", "Warehouse", "Payment", "Course", "Room", "Building", "Grant",
+           "Publication", "Contract", "Asset", "Ticket", "Survey", "Supplier", "Order", "Device", "Policy"]
+
+def add_unrelated_tables(conn: sqlite3.Connection, count: int, seed: int = 0):
+    # Pads the schema out to a large database's size with tables no question is about
+    rng = random.Random(seed)
+    previous = None
+    for index in range(count):
+        name = f"{DOMAINS[index % len(DOMAINS)]}Log{index}"
+        columns = [f"{name.lower()}_id INTEGER PRIMARY KEY", "code TEXT NOT NULL", "amount FLOAT", "created_at DATE"]
+        columns += [f"field_{rng.randrange(1000)} TEXT" for _ in range(rng.randrange(2, 6))]
+        if previous:
+            columns.append(f"parent_id INTEGER REFERENCES {previous}({previous.lower()}_id)")
+        conn.execute(f"CREATE TABLE {name} ({', '.join(columns)})")
+        previous = name
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt tokens and table recall with schema linking")
+    parser.add_argument("--db", default="sample.db")
+    parser.add_argument("--tokenizer", default="hf-internal-testing/tiny-random-LlamaForCausalLM")
+    parser.add_argument("--extra-tables", type=int, default=0, help="unrelated tables to add, e.g. 120")
+    parser.add_argument("--max-tables", type=int, default=8)
+    parser.add_argument("--model", help="also generate SQL both ways and compare execution results")
+    parser.add_argument("--adapter", default=None)
+    args = parser.parse_args()
+
+    # Work on an in-memory copy so the padding tables never touch the real file
+    conn = sqlite3.connect(":memory:")
+    sqlite3.connect(args.db).backup(conn)
+    add_unrelated_tables(conn, args.extra_tables)
+    tables = introspect(conn)
+    linker = SchemaLinker(tables, args.max_tables)
+    full_schema = render_schema(tables) if args.extra_tables else SCHEMA
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+
+    totals = {"full": 0, "linked": 0, "recalled": 0}
+    print(f"{len(tables)} tables\n{'question':<50} {'full':>6} {'linked':>6} {'recall':>6}  tables")
+    for question, gold in LABELED_QUESTIONS:
+        linked = linker.link(question)
+        full_tokens = len(tokenizer(build_prompt(question, full_schema)).input_ids)
+        linked_tokens = len(tokenizer(build_prompt(question, linker.prompt_schema(question))).input_ids)
+        recalled = gold <= set(linked)
+        totals["full"] += full_tokens
+        totals["linked"] += linked_tokens
+        totals["recalled"] += int(recalled)
+        print(f"{question[:50]:<50} {full_tokens:>6} {linked_tokens:>6} {str(recalled):>6}  {', '.join(linked)}")
+
+    count = len(LABELED_QUESTIONS)
+    print(
+        f"Mean prompt tokens: full {totals['full'] / count:.0f}, linked {totals['linked'] / count:.0f} "
+        f"({100 * (1 - totals['linked'] / totals['full']):.0f}% fewer); "
+        f"all needed tables kept for {totals['recalled']}/{count} questions"
+    )
+
+    if args.model:
+        from model_loading import load_model
+
+        model, tokenizer, _ = load_model(args.model, args.adapter)
+        torch.manual_seed(0)
+        agree = 0
+        for question, _ in LABELED_QUESTIONS:
+            prompts = [build_prompt(question, full_schema), build_prompt(question, linker.prompt_schema(question))]
+            budget = token_budget(question)
+            queries = [generate_batch([prompt], model, tokenizer, [budget], do_sample=False)[0] for prompt in prompts]
+            results = []
+            for query in queries:
+                try:
+                    results.append(sorted(map(repr, conn.execute(query).fetchall())))
+                except sqlite3.Error as e:
+                    results.append(f"error: {e}")
+            agree += int(results[0] == results[1] and not isinstance(results[0], str))
+        print(f"Same execution result with full and linked schema for {agree}/{count} questions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import time
+
+from bench_scheduler import QUESTIONS
+from generation import build_prompt, generate_batch
+from model_loading import load_model
+from speculative import SPECULATIVE_STATS, acceptance_rate, generate_speculative
+from stopping import token_budget
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-query latency with and without a draft model")
+    parser.add_argument("--model", default="hf-internal-testing/tiny-random-LlamaForCausalLM")
+    parser.add_argument("--adapter", default=None)
+    parser.add_argument("--draft", default="hf-internal-testing/tiny-random-LlamaForCausalLM")
+    parser.add_argument("--draft-adapter", default=None)
+    parser.add_argument("--precision", default="fp16")
+    parser.add_argument("--num-assistant-tokens", type=int, default=5)
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    args = parser.parse_args()
+
+    model, tokenizer, _ = load_model(args.model, args.adapter, args.precision)
+    draft_model, _, _ = load_model(args.draft, args.draft_adapter, args.precision)
+    # Greedy decoding, so both modes should produce the same SQL
+    generation_kwargs = {"do_sample": False, "max_new_tokens": args.max_new_tokens}
+
+    # Warm-up
+    generate_batch([build_prompt(QUESTIONS[0])], model, tokenizer, **generation_kwargs)
+    generate_speculative(build_prompt(QUESTIONS[0]), model, draft_model, tokenizer, **generation_kwargs)
+    for key in SPECULATIVE_STATS:
+        SPECULATIVE_STATS[key] = 0
+
+    print(f"{'question':<50} {'plain ms':>9} {'draft ms':>9} {'accept':>7} {'same':>5}")
+    totals = {"plain": 0.0, "speculative": 0.0}
+    for question in QUESTIONS:
+        prompt = build_prompt(question)
+        budget = token_budget(question, ceiling=args.max_new_tokens)
+
+        start = time.perf_counter()
+        plain = generate_batch([prompt], model, tokenizer, [budget], **generation_kwargs)[0]
+        plain_ms = 1000 * (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        drafted, metrics = generate_speculative(
+            prompt, model, draft_model, tokenizer, budget, args.num_assistant_tokens, **generation_kwargs
+        )
+        speculative_ms = 1000 * (time.perf_counter() - start)
+
+        totals["plain"] += plain_ms
+        totals["speculative"] += speculative_ms
+        print(
+            f"{question[:50]:<50} {plain_ms:>9.1f} {speculative_ms:>9.1f} "
+            f"{metrics['acceptance_rate']:>7.2f} {str(plain == drafted):>5}"
+        )
+
+    count = len(QUESTIONS)
+    print(f"Mean latency: plain {totals['plain'] / count:.1f} ms, speculative {totals['speculative'] / count:.1f} ms")
+    print(
+        f"Acceptance rate {acceptance_rate(SPECULATIVE_STATS)}, "
+        f"{SPECULATIVE_STATS['tokens_generated'] / max(1, SPECULATIVE_STATS['target_steps']):.2f} tokens per target step"
+    )
+
+if __name__ == "__main__":
+    main()
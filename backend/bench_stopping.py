@@ -0,0 +1,58 @@
+import argparse
+import statistics
+import time
+
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM, StoppingCriteria, StoppingCriteriaList
+
+from bench_scheduler import QUESTIONS
+from generation import GENERATION_KWARGS, build_prompt, generate_batch
+from stopping import token_budget
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Decode steps with a fixed 700-token budget vs SQL-aware stopping")
+    parser.add_argument("--model", default="hf-internal-testing/tiny-random-LlamaForCausalLM")
+    parser.add_argument("--max-new-tokens", type=int, default=GENERATION_KWARGS["max_new_tokens"])
+    return parser.parse_args()
+
+class StepCounter(StoppingCriteria):
+    # Never stops anything, just counts decode steps
+    def __init__(self):
+        self.steps = 0
+
+    def __call__(self, input_ids, scores, **kwargs):
+        self.steps += 1
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+def count_steps(model, tokenizer, question, kwargs, budgets=None):
+    counter = StepCounter()
+    start = time.perf_counter()
+    generate_batch(
+        [build_prompt(question)], model, tokenizer, budgets,
+        **kwargs, stopping_criteria=StoppingCriteriaList([counter]),
+    )
+    return counter.steps, time.perf_counter() - start
+
+def main():
+    args = parse_args()
+    print(f"Loading {args.model}...")
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForCausalLM.from_pretrained(args.model, torch_dtype=torch.float32)
+    model.eval()
+
+    kwargs = {"max_new_tokens": args.max_new_tokens, "do_sample": False, "temperature": None}
+    before, after = [], []
+    for question in QUESTIONS:
+        before.append(count_steps(model, tokenizer, question, kwargs))
+        budget = token_budget(question, ceiling=args.max_new_tokens)
+        after.append(count_steps(model, tokenizer, question, kwargs, [budget]))
+
+    for label, runs in (("Fixed budget", before), ("SQL stopping", after)):
+        steps = statistics.mean(steps for steps, _ in runs)
+        latency = statistics.mean(seconds for _, seconds in runs) * 1000
+        print(f"{label}: {steps:.1f} decode steps, {latency:.0f} ms per query")
+    saved = statistics.mean(b[0] - a[0] for b, a in zip(before, after))
+    print(f"Saved {saved:.1f} tokens per query on average")
+
+if __name__ == "__main__":
+    main()
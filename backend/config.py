@@ -0,0 +1,89 @@
+import os
+
+# Server settings, overridable through the environment
+
+# Dynamic batching for /query
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "8"))
+MAX_WAIT_MS = float(os.environ.get("MAX_WAIT_MS", "20"))
+
+# Model served by the API
+BASE_MODEL_ID = os.environ.get("BASE_MODEL_ID", "meta-llama/Llama-3.2-3B-Instruct")
+ADAPTER_PATH = os.environ.get("ADAPTER_PATH", "../sql-assistant-final")
+# A checkpoint written by merge_adapter.py; when set it replaces BASE_MODEL_ID + ADAPTER_PATH
+MERGED_MODEL_PATH = os.environ.get("MERGED_MODEL_PATH") or None
+# Extra adapters for the same base model as "name=path,name=path"; /query selects one by name
+ADAPTERS = dict(entry.split("=", 1) for entry in os.environ.get("ADAPTERS", "").split(",") if "=" in entry)
+MAX_LOADED_ADAPTERS = int(os.environ.get("MAX_LOADED_ADAPTERS", "4"))
+
+# Generated SQL cache; set RESULT_CACHE_PATH to keep entries across restarts
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", "3600"))
+RESULT_CACHE_PATH = os.environ.get("RESULT_CACHE_PATH") or None
+
+# Cached schema preambles (past_key_values), 0 disables the prefix cache
+PREFIX_CACHE_SIZE = int(os.environ.get("PREFIX_CACHE_SIZE", "4"))
+
+# Read-only connection pool used by /execute-query; the pool never writes, so WAL
+# mode (which create_db.py --scale sets) is chosen when the database is built
+DATABASE_PATH = os.environ.get("DATABASE_PATH", "sample.db")
+# At least 2: streamed results may never hold every connection
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "4"))
+QUERY_TIMEOUT_MS = float(os.environ.get("QUERY_TIMEOUT_MS", "5000"))
+DB_MMAP_SIZE = int(os.environ.get("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_CACHE_SIZE_KB = int(os.environ.get("DB_CACHE_SIZE_KB", str(64 * 1024)))
+DB_STATEMENT_CACHE = int(os.environ.get("DB_STATEMENT_CACHE", "256"))
+# How long a request waits for a free connection before a 503
+DB_POOL_WAIT_MS = float(os.environ.get("DB_POOL_WAIT_MS", "5000"))
+# Concurrent streamed results; always kept below DB_POOL_SIZE
+DB_MAX_STREAMS = int(os.environ.get("DB_MAX_STREAMS", "0")) or None
+
+# Result sets: default page size and hard cap on rows per query
+PAGE_SIZE = int(os.environ.get("PAGE_SIZE", "500"))
+MAX_RESULT_ROWS = int(os.environ.get("MAX_RESULT_ROWS", "10000"))
+
+# Arrow/Parquet exports are meant for analysts and get a larger cap
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "10000"))
+MAX_EXPORT_ROWS = int(os.environ.get("MAX_EXPORT_ROWS", "1000000"))
+
+# Executed queries are kept for the index advisor; QUERY_LOG_PATH also appends them
+# to a JSONL file that `python index_advisor.py` can replay against a scaled database
+ADVISOR_MAX_QUERIES = int(os.environ.get("ADVISOR_MAX_QUERIES", "500"))
+QUERY_LOG_PATH = os.environ.get("QUERY_LOG_PATH") or None
+
+# Generated SQL is validated before it runs; invalid SQL from /query is repaired
+# in-process up to VALIDATION_RETRIES times
+MAX_QUERY_COST = float(os.environ.get("MAX_QUERY_COST", "1e9"))
+VALIDATION_RETRIES = int(os.environ.get("VALIDATION_RETRIES", "2"))
+
+# /ask: generate, validate, execute and repair within one request
+ASK_MAX_ATTEMPTS = int(os.environ.get("ASK_MAX_ATTEMPTS", "3"))
+ASK_LATENCY_BUDGET_MS = float(os.environ.get("ASK_LATENCY_BUDGET_MS", "30000"))
+
+# Prompt only the tables a question is about (plus the tables they reference)
+SCHEMA_LINKING = os.environ.get("SCHEMA_LINKING", "0") == "1"
+SCHEMA_LINK_MAX_TABLES = int(os.environ.get("SCHEMA_LINK_MAX_TABLES", "8"))
+
+# Inference precision: fp16, int8, nf4 or cpu-int8 (see model_loading.py)
+INFERENCE_PRECISION = os.environ.get("INFERENCE_PRECISION", "fp16")
+
+# Where the model runs: auto picks CUDA when available, cpu serves from commodity nodes
+DEVICE = os.environ.get("DEVICE", "auto")
+# CPU serving: unquantized dtype (float32 or bfloat16), thread counts (0 keeps torch's default)
+CPU_DTYPE = os.environ.get("CPU_DTYPE", "float32")
+CPU_THREADS = int(os.environ.get("CPU_THREADS", "0"))
+CPU_INTEROP_THREADS = int(os.environ.get("CPU_INTEROP_THREADS", "0"))
+# torch.compile the model's forward; the first requests pay the compile time
+TORCH_COMPILE = os.environ.get("TORCH_COMPILE", "0") == "1"
+
+# Speculative decoding: a small model sharing the tokenizer drafts tokens that the
+# served model verifies, e.g. meta-llama/Llama-3.2-1B-Instruct; unset disables it
+DRAFT_MODEL_ID = os.environ.get("DRAFT_MODEL_ID") or None
+DRAFT_ADAPTER_PATH = os.environ.get("DRAFT_ADAPTER_PATH") or None
+NUM_ASSISTANT_TOKENS = int(os.environ.get("NUM_ASSISTANT_TOKENS", "5"))
+
+# Start loading the model in the background at startup (0 waits for the first request),
+# then run a short warm-up generation before /ready reports ready
+MODEL_PRELOAD = os.environ.get("MODEL_PRELOAD", "1") == "1"
+MODEL_WARMUP = os.environ.get("MODEL_WARMUP", "1") == "1"
+# Memory-map safetensors weights instead of reading them into memory up front
+SAFETENSORS_MMAP = os.environ.get("SAFETENSORS_MMAP", "1") == "1"
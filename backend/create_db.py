@@ -1,21 +1,12 @@
+import argparse
 import sqlite3
+import time
 from datetime import datetime, timedelta
 import random
 
-def create_database():
-    conn = sqlite3.connect('sample.db')
-    cursor = conn.cursor()
-
-    # Drop existing tables
-    cursor.executescript('''
-        DROP TABLE IF EXISTS Projects;
-        DROP TABLE IF EXISTS Students;
-        DROP TABLE IF EXISTS Teams;
-        DROP TABLE IF EXISTS TimeEntries;
-    ''')
+import numpy as np
 
-    # Create tables with simple, clear structure
-    cursor.executescript('''
+SCHEMA_SQL = '''
         CREATE TABLE Projects (
             project_id INTEGER PRIMARY KEY,
             name TEXT NOT NULL,
@@ -47,8 +38,39 @@ def create_database():
             task_type TEXT NOT NULL,
             FOREIGN KEY (student_id) REFERENCES Students(student_id)
         );
+'''
+
+# Foreign key indexes, built after bulk loads
+INDEX_SQL = '''
+        CREATE INDEX IF NOT EXISTS idx_students_team_id ON Students(team_id);
+        CREATE INDEX IF NOT EXISTS idx_students_project_id ON Students(project_id);
+        CREATE INDEX IF NOT EXISTS idx_timeentries_student_id ON TimeEntries(student_id);
+'''
+
+FIRST_NAMES = ["John", "Emma", "Michael", "Sarah", "David", "Lisa", "James", "Emily", "Daniel", "Sophie", "Ryan", "Olivia"]
+LAST_NAMES = ["Smith", "Davis", "Chen", "Wilson", "Brown", "Anderson", "Taylor", "White", "Lee", "Clark", "Martinez", "Wang"]
+PROJECT_TOPICS = ["Database System", "Mobile App", "AI Research", "Web Platform"]
+DEPARTMENTS = ["Computer Science", "Software Engineering", "Data Science", "Information Technology"]
+TEAM_NAMES = ["Alpha", "Beta", "Gamma", "Delta"]
+TASK_TYPES = ["Development", "Testing", "Documentation", "Meeting", "Research"]
+
+def reset_tables(cursor):
+    # Drop existing tables
+    cursor.executescript('''
+        DROP TABLE IF EXISTS Projects;
+        DROP TABLE IF EXISTS Students;
+        DROP TABLE IF EXISTS Teams;
+        DROP TABLE IF EXISTS TimeEntries;
     ''')
 
+    # Create tables with simple, clear structure
+    cursor.executescript(SCHEMA_SQL)
+
+def create_database():
+    conn = sqlite3.connect('sample.db')
+    cursor = conn.cursor()
+    reset_tables(cursor)
+
     # Sample data for Projects
     projects = [
         (1, "Database System", "Computer Science", 50000),
@@ -102,6 +124,97 @@ def create_database():
     conn.commit()
     conn.close()
 
+def numbered(labels, ids):
+    # e.g. "Alpha Team 17"; vectorized string building
+    return np.char.add(np.char.add(labels, " "), ids.astype(str))
+
+def insert_chunks(cursor, sql, total, chunk_size, make_chunk):
+    for start in range(0, total, chunk_size):
+        columns = make_chunk(start, min(start + chunk_size, total))
+        cursor.executemany(sql, zip(*(column.tolist() for column in columns)))
+
+def create_scaled_database(path='sample.db', scale=1e6, seed=0, chunk_size=100_000):
+    """Builds a synthetic dataset with ``scale`` time entries.
+
+    Students, teams and projects keep the ratios of the hand-written sample
+    (about one student per four entries, three students per team, one project
+    per team). The same seed always produces the same database.
+    """
+    entries = int(scale)
+    students = max(12, entries // 4)
+    teams = max(4, students // 3)
+    projects = teams
+    rng = np.random.default_rng(seed)
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    cursor = conn.cursor()
+    # Nothing to protect during a from-scratch load; a database that is being served
+    # can't leave WAL while the server's connections are open, so it stays in WAL
+    try:
+        cursor.execute("PRAGMA journal_mode=OFF")
+    except sqlite3.OperationalError:
+        pass
+    cursor.execute("PRAGMA synchronous=OFF")
+    reset_tables(cursor)
+
+    cursor.execute("BEGIN")
+    def project_chunk(start, end):
+        ids = np.arange(start + 1, end + 1)
+        topics = np.array(PROJECT_TOPICS)[(ids - 1) % len(PROJECT_TOPICS)]
+        departments = np.array(DEPARTMENTS)[(ids - 1) % len(DEPARTMENTS)]
+        budgets = rng.integers(10, 21, size=len(ids)) * 5000
+        return ids, numbered(topics, ids), departments, budgets
+    insert_chunks(cursor, 'INSERT INTO Projects VALUES (?,?,?,?)', projects, chunk_size, project_chunk)
+
+    def team_chunk(start, end):
+        ids = np.arange(start + 1, end + 1)
+        labels = np.char.add(np.array(TEAM_NAMES)[(ids - 1) % len(TEAM_NAMES)], " Team")
+        return ids, numbered(labels, ids)
+    insert_chunks(cursor, 'INSERT INTO Teams VALUES (?,?)', teams, chunk_size, team_chunk)
+
+    def student_chunk(start, end):
+        ids = np.arange(start + 1, end + 1)
+        names = np.char.add(
+            np.char.add(np.array(FIRST_NAMES)[rng.integers(0, len(FIRST_NAMES), len(ids))], " "),
+            np.array(LAST_NAMES)[rng.integers(0, len(LAST_NAMES), len(ids))],
+        )
+        team_ids = np.minimum((ids - 1) // 3 + 1, teams)  # 3 students per team
+        grades = rng.uniform(3.0, 4.0, len(ids)).round(2)
+        enrolled = np.datetime64('2023-01-01') + rng.integers(0, 365, len(ids))
+        return ids, names, team_ids, team_ids, grades, enrolled.astype(str)
+    insert_chunks(cursor, 'INSERT INTO Students VALUES (?,?,?,?,?,?)', students, chunk_size, student_chunk)
+
+    def entry_chunk(start, end):
+        ids = np.arange(start + 1, end + 1)
+        student_ids = rng.integers(1, students + 1, len(ids))
+        hours = rng.integers(1, 9, len(ids))
+        task_dates = np.datetime64('2024-01-01') + rng.integers(0, 61, len(ids))
+        task_types = np.array(TASK_TYPES)[rng.integers(0, len(TASK_TYPES), len(ids))]
+        return ids, student_ids, hours, task_dates.astype(str), task_types
+    insert_chunks(cursor, 'INSERT INTO TimeEntries VALUES (?,?,?,?,?)', entries, chunk_size, entry_chunk)
+    cursor.execute("COMMIT")
+
+    # Indexes and planner statistics are cheaper to build once the data is in
+    cursor.executescript(INDEX_SQL)
+    cursor.execute("ANALYZE")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+    return {"projects": projects, "teams": teams, "students": students, "time_entries": entries}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create the sample database")
+    parser.add_argument("--scale", type=float, help="number of time entries to generate (e.g. 1e6); omit for the small hand-written sample")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--db", default="sample.db")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    create_database()
-    print("Database created successfully with sample data!")
\ No newline at end of file
+    args = parse_args()
+    if args.scale is None:
+        create_database()
+        print("Database created successfully with sample data!")
+    else:
+        start = time.perf_counter()
+        counts = create_scaled_database(args.db, args.scale, args.seed, args.chunk_size)
+        print(f"Created {args.db} in {time.perf_counter() - start:.1f}s: {counts}")
@@ -0,0 +1,193 @@
+import asyncio
+import base64
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from result_cache import fingerprint
+
+def encode_cursor(sql: str, offset: int) -> str:
+    payload = json.dumps({"q": fingerprint(sql), "o": offset})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(sql: str, token: str) -> int:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        offset = int(payload["o"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("invalid continuation cursor")
+    if payload.get("q") != fingerprint(sql) or offset < 0:
+        raise ValueError("continuation cursor does not belong to this query")
+    return offset
+
+class PoolTimeout(Exception):
+    """No pooled connection (or stream slot) became free in time; the API answers 503."""
+
+def load_schema(conn: sqlite3.Connection) -> dict:
+    # {table: {column: declared type}}
+    schema = {}
+    tables = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'").fetchall()
+    for (table,) in tables:
+        schema[table] = {column[1]: column[2] or "" for column in conn.execute(f'PRAGMA table_info("{table}")')}
+    return schema
+
+def describe(cursor: sqlite3.Cursor) -> list:
+    return [{"name": column[0]} for column in cursor.description or []]
+
+class ConnectionPool:
+    """Read-only SQLite connections served from a dedicated thread pool.
+
+    Every query runs under a progress handler that interrupts it once it
+    exceeds ``timeout_ms``, so one runaway generated query can't hold a
+    connection (or the event loop) indefinitely. Waiting for a free
+    connection gives up after ``wait_ms`` with PoolTimeout.
+
+    A streamed result keeps its connection checked out between batches, for
+    as long as the client takes to read them. At most ``max_streams`` (fewer
+    than ``size``) streams run at once, so slow readers can never hold every
+    connection and starve the non-streaming queries, which is why the pool
+    needs at least two connections.
+    """
+
+    def __init__(self, path: str, size: int = 4, timeout_ms: float = 5000, mmap_size: int = 256 * 1024 * 1024,
+                 cache_size_kb: int = 64 * 1024, statement_cache: int = 256, wait_ms: float = 5000,
+                 max_streams: Optional[int] = None):
+        if size < 2:
+            raise ValueError(f"a connection pool needs at least 2 connections (one is kept free of streams), got {size}")
+        self.path = path
+        self.size = size
+        self.timeout = timeout_ms / 1000
+        self.wait = wait_ms / 1000
+        self.max_streams = max(1, min(max_streams or size - 1, size - 1))
+        self._streams = threading.BoundedSemaphore(self.max_streams)
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self.statement_cache = statement_cache
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="sqlite")
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        uri = f"file:{os.path.abspath(self.path)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=self.statement_cache)
+        conn.execute("PRAGMA query_only=ON")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.wait)
+                except queue.Empty:
+                    raise PoolTimeout(f"all {self.size} database connections are busy, try again shortly")
+
+        try:
+            yield conn
+        finally:
+            conn.set_progress_handler(None, 0)
+            self._idle.put(conn)
+
+    @contextmanager
+    def deadline(self, conn: sqlite3.Connection):
+        expires = time.monotonic() + self.timeout
+        conn.set_progress_handler(lambda: time.monotonic() > expires, 1000)
+        try:
+            yield
+        except sqlite3.OperationalError as e:
+            if time.monotonic() > expires:
+                raise sqlite3.OperationalError(f"query exceeded the {self.timeout * 1000:.0f} ms time limit") from e
+            raise
+
+    def call(self, fn):
+        # Runs fn(conn) on a pooled connection, e.g. for catalog lookups
+        with self.connection() as conn, self.deadline(conn):
+            return fn(conn)
+
+    def fetch_all(self, sql: str, params: tuple = ()) -> list:
+        with self.connection() as conn, self.deadline(conn):
+            return conn.execute(sql, params).fetchall()
+
+    def fetch_page(self, sql: str, page_size: int, cursor: Optional[str] = None, max_rows: int = 10000) -> dict:
+        offset = decode_cursor(sql, cursor) if cursor else 0
+        limit = max(0, min(page_size, max_rows - offset))
+
+        with self.connection() as conn, self.deadline(conn):
+            result = conn.execute(sql)
+            # Earlier pages are re-read and dropped; nothing is kept server side between calls
+            remaining = offset
+            while remaining > 0:
+                skipped = result.fetchmany(min(remaining, 1000))
+                if not skipped:
+                    break
+                remaining -= len(skipped)
+            rows = result.fetchmany(limit) if limit else []
+            has_more = result.fetchone() is not None
+
+        end = offset + len(rows)
+        return {
+            "columns": describe(result),
+            "results": rows,
+            "next_cursor": encode_cursor(sql, end) if has_more and end < max_rows else None,
+            "truncated": has_more and end >= max_rows,
+        }
+
+    def iter_rows(self, sql: str, batch_size: int = 500, max_rows: int = 10000) -> Iterator[dict]:
+        # Yields {"columns"}, then {"rows"} batches, then a final {"row_count", "truncated"}
+        if not self._streams.acquire(timeout=self.wait):
+            raise PoolTimeout(f"{self.max_streams} results are already streaming, try again shortly")
+        try:
+            yield from self._iter_rows(sql, batch_size, max_rows)
+        finally:
+            self._streams.release()
+
+    def _iter_rows(self, sql: str, batch_size: int, max_rows: int) -> Iterator[dict]:
+        with self.connection() as conn:
+            with self.deadline(conn):
+                result = conn.execute(sql)
+            yield {"columns": describe(result)}
+
+            sent = 0
+            truncated = False
+            while True:
+                # The time limit applies per batch so slow readers aren't cut off
+                with self.deadline(conn):
+                    rows = result.fetchmany(min(batch_size, max_rows - sent))
+                    if sent + len(rows) >= max_rows:
+                        truncated = result.fetchone() is not None
+                if rows:
+                    sent += len(rows)
+                    yield {"rows": rows}
+                if not rows or sent >= max_rows:
+                    break
+            yield {"row_count": sent, "truncated": truncated}
+
+    async def run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
@@ -0,0 +1,175 @@
+import os
+
+# Evaluation only reads cached models and local dataset files
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import argparse
+import json
+import re
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import sqlglot
+from sqlglot.errors import SqlglotError
+
+from generation import build_prompt, generate_batch
+from model_loading import PRECISIONS, load_model
+from schema_linker import introspect, render_schema
+from stopping import token_budget
+
+def database_path(spider_dir: str, db_id: str) -> str:
+    return os.path.join(spider_dir, "database", db_id, f"{db_id}.sqlite")
+
+def normalize_sql(sql: str) -> str:
+    # Formatting, keyword case and trailing semicolons don't count against exact match
+    sql = sql.strip().rstrip(";")
+    try:
+        return sqlglot.parse_one(sql, read="sqlite").sql(dialect="sqlite", normalize=True)
+    except SqlglotError:
+        return re.sub(r"\s+", " ", sql).lower()
+
+def execute(path: str, sql: str, timeout_s: float):
+    """Runs one query read-only in a worker process: ("ok", rows) or ("error", message)."""
+    if not sql.strip():
+        return "error", "empty query"
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    deadline = time.monotonic() + timeout_s
+    # Interrupts runaway queries inside SQLite; the pool's own timeout is a backstop
+    conn.set_progress_handler(lambda: time.monotonic() > deadline, 10_000)
+    try:
+        return "ok", conn.execute(sql).fetchall()
+    except sqlite3.Error as e:
+        return "error", str(e)
+    finally:
+        conn.close()
+
+def stop_pool(pool: ProcessPoolExecutor, hung: bool):
+    """Shuts the pool down without waiting on workers stuck in a timed-out query."""
+    if not hung:
+        pool.shutdown(wait=True)
+        return
+    # shutdown() forgets the workers, and a stuck one would still block interpreter exit
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.kill()
+
+def same_results(predicted: list, gold: list, ordered: bool) -> bool:
+    # Spider compares result multisets, and row order only when the gold query sorts
+    if ordered:
+        return predicted == gold
+    return Counter(map(repr, predicted)) == Counter(map(repr, gold))
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+def generate_predictions(examples: list, spider_dir: str, args) -> None:
+    adapter = None if args.adapter == "none" else args.adapter
+    model, tokenizer, _ = load_model(args.model, adapter, args.precision, args.device)
+    schemas = {}
+    for example in examples:
+        if example["db_id"] not in schemas:
+            conn = sqlite3.connect(f"file:{database_path(spider_dir, example['db_id'])}?mode=ro", uri=True)
+            schemas[example["db_id"]] = render_schema(introspect(conn))
+            conn.close()
+
+    # Length-sorted batches; each question's latency is its batch's wall time
+    order = sorted(range(len(examples)), key=lambda i: len(examples[i]["question"]))
+    for offset in range(0, len(order), args.batch_size):
+        batch = [examples[i] for i in order[offset:offset + args.batch_size]]
+        prompts = [build_prompt(example["question"], schemas[example["db_id"]]) for example in batch]
+        budgets = [token_budget(example["question"]) for example in batch]
+        start = time.perf_counter()
+        queries = generate_batch(prompts, model, tokenizer, budgets, do_sample=False)
+        elapsed_ms = 1000 * (time.perf_counter() - start)
+        for example, query in zip(batch, queries):
+            example["predicted"] = query
+            example["latency_ms"] = elapsed_ms
+        print(f"Generated {min(offset + args.batch_size, len(order))}/{len(order)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Exact match and execution accuracy on a local Spider-format dev set")
+    parser.add_argument("--spider-dir", required=True, help="directory with dev.json and database/<db_id>/<db_id>.sqlite")
+    parser.add_argument("--split", default="dev.json")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--predictions", help="JSONL with id and sql_query (e.g. from batch_generate.py) instead of generating")
+    parser.add_argument("--model", default="meta-llama/Llama-3.2-3B-Instruct")
+    parser.add_argument("--adapter", default="../sql-assistant-final", help="'none' for merged checkpoints")
+    parser.add_argument("--precision", default="fp16", choices=PRECISIONS)
+    parser.add_argument("--device", default="auto")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds per query")
+    parser.add_argument("--output", help="write per-example results as JSONL")
+    args = parser.parse_args()
+
+    with open(os.path.join(args.spider_dir, args.split)) as f:
+        examples = [{"id": str(index), **example} for index, example in enumerate(json.load(f))][:args.limit]
+
+    generate_start = time.perf_counter()
+    if args.predictions:
+        with open(args.predictions) as f:
+            predicted = {row["id"]: row["sql_query"] for row in map(json.loads, f) if row}
+        for example in examples:
+            example["predicted"] = predicted.get(example["id"], "")
+    else:
+        generate_predictions(examples, args.spider_dir, args)
+    generate_seconds = time.perf_counter() - generate_start
+
+    # Predicted and gold queries run side by side in worker processes
+    pool = ProcessPoolExecutor(max_workers=args.workers)
+    hung = False
+    try:
+        jobs = []
+        for example in examples:
+            path = database_path(args.spider_dir, example["db_id"])
+            jobs.append((
+                pool.submit(execute, path, example["predicted"], args.timeout),
+                pool.submit(execute, path, example["query"], args.timeout),
+            ))
+        for example, (predicted_job, gold_job) in zip(examples, jobs):
+            outcomes = []
+            for job in (predicted_job, gold_job):
+                try:
+                    outcomes.append(job.result(timeout=args.timeout + 5))
+                except FutureTimeout:
+                    hung = True
+                    outcomes.append(("error", "timed out"))
+            (predicted_status, predicted_rows), (gold_status, gold_rows) = outcomes
+            ordered = "order by" in example["query"].lower()
+            example["exact_match"] = normalize_sql(example["predicted"]) == normalize_sql(example["query"])
+            example["execution_match"] = (
+                predicted_status == "ok" and gold_status == "ok" and same_results(predicted_rows, gold_rows, ordered)
+            )
+            example["error"] = predicted_rows if predicted_status == "error" else None
+            example["gold_error"] = gold_rows if gold_status == "error" else None
+    finally:
+        stop_pool(pool, hung)
+
+    count = len(examples)
+    exact = sum(example["exact_match"] for example in examples)
+    executed = sum(example["execution_match"] for example in examples)
+    errors = sum(example["error"] is not None for example in examples)
+    gold_errors = sum(example["gold_error"] is not None for example in examples)
+    print(f"Examples: {count}")
+    print(f"Exact match:        {exact}/{count} ({100 * exact / max(1, count):.1f}%)")
+    print(f"Execution accuracy: {executed}/{count} ({100 * executed / max(1, count):.1f}%)")
+    print(f"Predicted queries that failed: {errors}, gold queries that failed: {gold_errors}")
+    if not args.predictions:
+        latencies = [example["latency_ms"] for example in examples]
+        print(
+            f"Latency p50 {percentile(latencies, 0.5):.0f} ms, p90 {percentile(latencies, 0.9):.0f} ms, "
+            f"p99 {percentile(latencies, 0.99):.0f} ms; {count / generate_seconds:.2f} questions/s"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            for example in examples:
+                f.write(json.dumps(example) + "\n")
+
+if __name__ == "__main__":
+    main()
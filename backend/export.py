@@ -0,0 +1,176 @@
+import io
+from typing import Iterator, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+from sqlglot.optimizer.qualify import qualify
+
+def arrow_type(declared: str) -> Optional[pa.DataType]:
+    # Follows SQLite's type affinity rules for the declared column type
+    declared = declared.upper()
+    if "INT" in declared:
+        return pa.int64()
+    if any(name in declared for name in ("CHAR", "CLOB", "TEXT")):
+        return pa.string()
+    if "BLOB" in declared:
+        return pa.binary()
+    if any(name in declared for name in ("REAL", "FLOA", "DOUB")):
+        return pa.float64()
+    if declared in ("DATE", "DATETIME", "TIMESTAMP"):
+        return pa.date32() if declared == "DATE" else pa.timestamp("s")
+    return None
+
+def declared_types(sql: str, schema: dict) -> List[Optional[pa.DataType]]:
+    """Arrow type of each result column that plainly references a table column.
+
+    Expressions, aggregates, columns of subqueries or CTEs and compound
+    queries get None and are inferred from their values: an alias like
+    ``AVG(hours) AS hours`` must not pick up the INTEGER type of ``hours``.
+    """
+    try:
+        tree = qualify(sqlglot.parse_one(sql, read="sqlite"), schema=schema, dialect="sqlite", quote_identifiers=False)
+    except SqlglotError:
+        return []
+    if not isinstance(tree, exp.Select):
+        return []
+
+    tables = {name.lower(): {column.lower(): declared for column, declared in columns.items()} for name, columns in schema.items()}
+    ctes = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    sources = {}
+    for table in tree.find_all(exp.Table):
+        name = table.name.lower()
+        if table.parent_select is tree and name in tables and name not in ctes:
+            sources[table.alias_or_name.lower()] = tables[name]
+
+    types = []
+    for projection in tree.expressions:
+        column = projection.this if isinstance(projection, exp.Alias) else projection
+        declared = None
+        if isinstance(column, exp.Column) and column.table.lower() in sources:
+            declared = arrow_type(sources[column.table.lower()].get(column.name.lower(), ""))
+        types.append(declared)
+    return types
+
+def infer_type(values: list) -> pa.DataType:
+    # Used for expression columns (COUNT(*), AVG(...)) that have no declared type
+    kinds = {type(value) for value in values if value is not None}
+    if kinds <= {int}:
+        return pa.int64() if kinds else pa.string()
+    if kinds <= {int, float}:
+        return pa.float64()
+    if kinds <= {bytes}:
+        return pa.binary()
+    return pa.string()
+
+ARROW_ERRORS = (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError)
+
+def to_array(name: str, values: list, dtype: pa.DataType) -> pa.Array:
+    try:
+        if pa.types.is_date32(dtype) or pa.types.is_timestamp(dtype):
+            return pa.array(values, pa.string()).cast(dtype)
+        if pa.types.is_string(dtype):
+            values = [value if value is None or isinstance(value, str) else str(value) for value in values]
+        try:
+            return pa.array(values, dtype)
+        except ARROW_ERRORS:
+            # e.g. integers in a REAL column: infer, then cast without losing data
+            return pa.array(values).cast(dtype)
+    except ARROW_ERRORS:
+        raise ValueError(f"column '{name}' holds values that don't fit {dtype}; export it with format=json instead")
+
+class ArrowBatches:
+    """Turns the {"columns"} / {"rows"} items of ConnectionPool.iter_rows into record batches.
+
+    The schema is fixed by the first batch: each column takes its declared
+    type (see declared_types), else the type inferred from its values, else
+    string, whichever first fits those values. Convert the first batch
+    before streaming, so only later batches that break the schema can fail
+    mid-response. ``summary`` keeps the final {"row_count", "truncated"} item.
+    """
+
+    def __init__(self, columns: List[dict], types: List[Optional[pa.DataType]]):
+        self.names = [column["name"] for column in columns]
+        # Positional, since result column names can repeat
+        self.types = types if len(types) == len(self.names) else [None] * len(self.names)
+        self.schema = None
+        self.summary = None
+
+    def convert(self, rows: list) -> pa.RecordBatch:
+        values = [list(column) for column in zip(*rows)] if rows else [[] for _ in self.names]
+        if self.schema is not None:
+            arrays = [to_array(field.name, column, field.type) for field, column in zip(self.schema, values)]
+            return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+        arrays = []
+        for name, declared, column in zip(self.names, self.types, values):
+            candidates = [dtype for dtype in (declared, infer_type(column)) if dtype is not None] + [pa.string()]
+            for dtype in candidates:
+                try:
+                    arrays.append(to_array(name, column, dtype))
+                    break
+                except ValueError:
+                    continue
+        self.schema = pa.schema([(name, array.type) for name, array in zip(self.names, arrays)])
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+def summary_metadata(summary: Optional[dict]) -> dict:
+    # Arrow and Parquet metadata values are strings
+    summary = summary or {}
+    return {"row_count": str(summary.get("row_count", "")), "truncated": str(bool(summary.get("truncated"))).lower()}
+
+def first_batch(columns: List[dict], items: Iterator[dict], types: List[Optional[pa.DataType]]):
+    # Fixes the schema from the first rows, so type problems surface before the response starts
+    batches = ArrowBatches(columns, types)
+    for item in items:
+        if "rows" in item:
+            return batches, batches.convert(item["rows"])
+        batches.summary = item
+    return batches, batches.convert([])
+
+def arrow_stream(batches: ArrowBatches, first: pa.RecordBatch, items: Iterator[dict]) -> Iterator[bytes]:
+    # Arrow IPC stream, flushed to the client one record batch at a time. Headers
+    # are long gone by the end, so a last empty batch carries summary_metadata
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, first.schema)
+    if first.num_rows:
+        writer.write_batch(first)
+    yield sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+
+    for item in items:
+        if "rows" not in item:
+            batches.summary = item
+            continue
+        writer.write_batch(batches.convert(item["rows"]))
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+
+    writer.write_batch(first.slice(0, 0), custom_metadata=summary_metadata(batches.summary))
+    writer.close()
+    yield sink.getvalue()
+
+def parquet_bytes(columns: List[dict], items: Iterator[dict], types: List[Optional[pa.DataType]]):
+    # Parquet needs its footer before the file is usable, so it is built in memory;
+    # returns the file and the final {"row_count", "truncated"} item
+    batches = ArrowBatches(columns, types)
+    sink = io.BytesIO()
+    writer = None
+    for item in items:
+        if "rows" not in item:
+            batches.summary = item
+            continue
+        batch = batches.convert(item["rows"])
+        if writer is None:
+            writer = pq.ParquetWriter(sink, batch.schema)
+        writer.write_batch(batch)
+
+    if writer is None:
+        writer = pq.ParquetWriter(sink, batches.convert([]).schema)
+    writer.add_key_value_metadata(summary_metadata(batches.summary))
+    writer.close()
+    return sink.getvalue(), batches.summary or {}
@@ -0,0 +1,108 @@
+from typing import List, Optional
+
+import torch
+from transformers import StoppingCriteriaList
+
+from stopping import SQLStoppingCriteria, strip_sql_fence
+
+# Schema of sample.db for offline tools and benchmarks; the server renders the
+# same text from the live database (see schema_catalog.py)
+SCHEMA = """
+TABLE STRUCTURES:
+
+1. Projects
+   - project_id: INTEGER PRIMARY KEY
+   - name: TEXT NOT NULL
+   - department: TEXT NOT NULL
+   - budget: INTEGER NOT NULL
+
+2. Teams
+   - team_id: INTEGER PRIMARY KEY
+   - name: TEXT NOT NULL
+
+3. Students
+   - student_id: INTEGER PRIMARY KEY
+   - name: TEXT NOT NULL
+   - team_id: INTEGER NOT NULL (references Teams.team_id)
+   - project_id: INTEGER (references Projects.project_id)
+   - grade: FLOAT DEFAULT 0.0
+   - enrollment_date: DATE NOT NULL
+
+4. TimeEntries
+   - entry_id: INTEGER PRIMARY KEY
+   - student_id: INTEGER NOT NULL (references Students.student_id)
+   - hours: INTEGER NOT NULL
+   - task_date: DATE NOT NULL
+   - task_type: TEXT NOT NULL
+"""
+
+# Sampling settings shared by every generation path
+GENERATION_KWARGS = {
+    "max_new_tokens": 700,
+    "temperature": 0.1,
+    "do_sample": True,
+    "num_return_sequences": 1,
+    "repetition_penalty": 1.2,
+}
+
+def prompt_prefix(schema: str = SCHEMA) -> str:
+    # Everything before the question is identical across requests for a schema
+    return f"""[INST]
+Based on the following database schema:
+{schema}
+
+"""
+
+def question_suffix(question: str) -> str:
+    return f"""Write one SQL query for this question: {question}
+
+CRITICAL: Output only the SQL query.
+[/INST]"""
+
+def build_prompt(question: str, schema: str = SCHEMA, previous_error: Optional[str] = None, previous_query: Optional[str] = None) -> str:
+    if previous_error and previous_query:
+        return f"""[INST]Fix this SQL query:
+
+Previous query: {previous_query}
+Error: {previous_error}
+
+CRITICAL: Output only the fixed SQL query.[/INST]"""
+
+    return prompt_prefix(schema) + question_suffix(question)
+
+def with_sql_stopping(tokenizer, budgets: Optional[List[int]], generation_kwargs: dict, prompt_length: Optional[int] = None):
+    # Adds per-row SQL stopping and caps max_new_tokens at the largest budget
+    kwargs = {**GENERATION_KWARGS, **generation_kwargs}
+    if budgets is None:
+        return kwargs, None
+    criteria = SQLStoppingCriteria(tokenizer, budgets, ceiling=kwargs["max_new_tokens"], prompt_length=prompt_length)
+    kwargs["max_new_tokens"] = min(kwargs["max_new_tokens"], max(budgets))
+    kwargs["stopping_criteria"] = StoppingCriteriaList([criteria, *kwargs.get("stopping_criteria", [])])
+    return kwargs, criteria
+
+def decode_responses(tokenizer, new_tokens) -> List[str]:
+    responses = tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+    return [strip_sql_fence(response.split("[/INST]")[-1]) for response in responses]
+
+def generate_batch(prompts: List[str], model, tokenizer, budgets: Optional[List[int]] = None, **generation_kwargs) -> List[str]:
+    # Left padding keeps every prompt flush against its generated tokens
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    inputs = tokenizer(prompts, return_tensors="pt", padding=True).to(model.device)
+    # Assisted generation can append several tokens per step, so the stopping
+    # criteria need to know where the prompt ends
+    kwargs, criteria = with_sql_stopping(tokenizer, budgets, generation_kwargs, inputs["input_ids"].shape[1])
+    with torch.inference_mode():
+        outputs = model.generate(
+            **inputs,
+            **kwargs,
+            eos_token_id=tokenizer.eos_token_id,
+            pad_token_id=tokenizer.pad_token_id,
+        )
+    if criteria is not None:
+        criteria.record()
+
+    # Only decode the new tokens; the prompt is the same width for every row
+    return decode_responses(tokenizer, outputs[:, inputs["input_ids"].shape[1]:])
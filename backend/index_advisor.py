@@ -0,0 +1,250 @@
+import argparse
+import json
+import re
+import sqlite3
+import statistics
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.optimizer.qualify import qualify
+
+from database import load_schema
+
+EQUALITY = (exp.EQ, exp.In)
+RANGE = (exp.GT, exp.GTE, exp.LT, exp.LTE, exp.Between, exp.Like)
+SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?$")
+MAX_INDEX_COLUMNS = 6
+
+def rowid_columns(conn: sqlite3.Connection, table: str) -> set:
+    # An INTEGER PRIMARY KEY is the rowid and is already part of every index
+    columns = conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+    keys = [column for column in columns if column[5]]
+    if len(keys) == 1 and keys[0][2].upper() == "INTEGER":
+        return {keys[0][1]}
+    return set()
+
+def predicate_kind(column: exp.Column) -> Optional[str]:
+    # Only columns compared in WHERE / JOIN ... ON of their own SELECT count
+    scope = column.find_ancestor(exp.Where, exp.Join, exp.Select)
+    if not isinstance(scope, (exp.Where, exp.Join)):
+        return None
+    if isinstance(column.parent, EQUALITY):
+        other = [arg for arg in column.parent.args.values() if isinstance(arg, exp.Expression) and arg is not column]
+        return "join" if any(isinstance(arg, exp.Column) for arg in other) else "equality"
+    if isinstance(column.parent, RANGE):
+        return "range"
+    return None
+
+def column_usage(sql: str, schema: dict) -> dict:
+    """Maps each table alias to its table and the columns the query uses.
+
+    ``{"t": {"table": "TimeEntries", "equality": [...], "join": [...], "range": [...], "referenced": [...]}}``
+    """
+    names = {table.lower(): table for table in schema}
+    columns = {table.lower(): {column.lower(): column for column in cols} for table, cols in schema.items()}
+    tree = qualify(sqlglot.parse_one(sql, read="sqlite"), schema=schema, dialect="sqlite", quote_identifiers=False)
+
+    usage = {}
+    for table in tree.find_all(exp.Table):
+        if table.name.lower() in names:
+            usage[table.alias_or_name.lower()] = {
+                "table": names[table.name.lower()], "equality": [], "join": [], "range": [], "referenced": [],
+            }
+
+    for column in tree.find_all(exp.Column):
+        entry = usage.get(column.table.lower())
+        if entry is None:
+            continue
+        name = columns[entry["table"].lower()].get(column.name.lower())
+        if name is None:
+            continue
+        kind = predicate_kind(column)
+        for key in filter(None, (kind, "referenced")):
+            if name not in entry[key]:
+                entry[key].append(name)
+    return usage
+
+def full_scans(conn: sqlite3.Connection, sql: str) -> List[tuple]:
+    """(alias, outer) for each table EXPLAIN QUERY PLAN reads with a full scan.
+
+    ``outer`` is True when the scan is the outermost loop of its SELECT: it
+    runs once, so an index on its join columns would never be used.
+    """
+    scans = []
+    loops = Counter()
+    for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+        parent, detail = row[1], row[3]
+        if not detail.startswith(("SCAN", "SEARCH")):
+            continue
+        match = SCAN.match(detail)
+        if match:
+            scans.append(((match.group(2) or match.group(1)).lower(), loops[parent] == 0))
+        # Loops of one SELECT are siblings under the same parent, outermost first
+        loops[parent] += 1
+    return scans
+
+class IndexAdvisor:
+    """Records executed queries and proposes covering indexes for their full scans.
+
+    ``record`` is called on the event loop, so the query log is appended on
+    a background thread.
+    """
+
+    def __init__(self, max_queries: int = 500, log_path: Optional[str] = None):
+        self.max_queries = max_queries
+        self.log_path = log_path
+        self.queries = OrderedDict()
+        self._lock = threading.Lock()
+        # One thread keeps the log lines in order
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-log") if log_path else None
+
+    def record(self, sql: str, elapsed_ms: float):
+        sql = sql.strip().rstrip(";")
+        with self._lock:
+            count, total = self.queries.pop(sql, (0, 0.0))
+            self.queries[sql] = (count + 1, total + elapsed_ms)
+            while len(self.queries) > self.max_queries:
+                self.queries.popitem(last=False)
+        if self._writer is not None:
+            self._writer.submit(self._append, json.dumps({"query": sql, "elapsed_ms": elapsed_ms}) + "\n")
+
+    def _append(self, line: str):
+        try:
+            with open(self.log_path, "a") as f:
+                f.write(line)
+        except OSError as e:
+            print(f"Could not write the query log: {str(e)}")
+
+    def close(self):
+        # Waits for pending log lines
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+
+    def recommend(self, conn: sqlite3.Connection) -> List[dict]:
+        with self._lock:
+            workload = list(self.queries.items())
+        return recommend(conn, [(sql, count) for sql, (count, _) in workload])
+
+def recommend(conn: sqlite3.Connection, workload: List[tuple]) -> List[dict]:
+    schema = load_schema(conn)
+    proposals = OrderedDict()
+    for sql, count in workload:
+        try:
+            scans = full_scans(conn, sql)
+            usage = column_usage(sql, schema) if scans else {}
+        except (sqlite3.Error, sqlglot.errors.SqlglotError) as e:
+            print(f"Index advisor skipped query: {str(e)}")
+            continue
+
+        for alias, outer in scans:
+            entry = usage.get(alias)
+            if entry is None:
+                continue
+            skip = rowid_columns(conn, entry["table"])
+            # Join columns only help the inner side of a join, which is looked up once per outer row
+            joins = [] if outer else entry["join"]
+            keys = [c for c in entry["equality"] + joins + entry["range"] if c not in skip]
+            if not keys:
+                continue
+            # Constant filters lead, then join keys and ranges, then the rest of what the query reads
+            columns = list(dict.fromkeys(keys + [c for c in entry["referenced"] if c not in skip]))
+            if len(columns) > MAX_INDEX_COLUMNS:
+                columns = list(dict.fromkeys(keys))[:MAX_INDEX_COLUMNS]
+
+            key = (entry["table"], tuple(columns))
+            proposal = proposals.setdefault(key, {
+                "table": entry["table"],
+                "columns": columns,
+                "sql": f"CREATE INDEX IF NOT EXISTS idx_advisor_{entry['table'].lower()}_{'_'.join(columns).lower()} "
+                       f"ON {entry['table']}({', '.join(columns)})",
+                "range_only": not (entry["equality"] or joins),
+                "queries": [],
+                "executions": 0,
+            })
+            proposal["queries"].append(sql)
+            proposal["executions"] += count
+    return sorted(proposals.values(), key=lambda p: -p["executions"])
+
+def estimate_speedup(conn: sqlite3.Connection, proposal: dict) -> float:
+    # Full scan rows vs rows read per lookup on the index's leading column. Like
+    # SQLite's planner without stat4, a range is assumed to keep a quarter of the rows.
+    if proposal["range_only"]:
+        return 4.0
+    table, lead = proposal["table"], proposal["columns"][0]
+    rows, distinct = conn.execute(f'SELECT COUNT(*), COUNT(DISTINCT "{lead}") FROM "{table}"').fetchone()
+    return rows / max(1, rows / max(1, distinct))
+
+def time_query(conn: sqlite3.Connection, sql: str, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        conn.execute(sql).fetchall()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def evaluate(path: str, workload: List[tuple], apply: bool = False, repeats: int = 3) -> List[dict]:
+    """Builds each proposed index, measures its queries before and after, and
+    rolls it back (with its planner statistics) unless ``apply`` is set and it
+    made them faster."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    report = []
+    for proposal in recommend(conn, workload):
+        before = sum(time_query(conn, sql, repeats) for sql in proposal["queries"])
+        proposal["estimated_speedup"] = round(estimate_speedup(conn, proposal), 1)
+
+        # The index and the sqlite_stat1 rows ANALYZE writes only persist if the index is kept
+        conn.execute("SAVEPOINT proposal")
+        start = time.perf_counter()
+        conn.execute(proposal["sql"])
+        conn.execute(f'ANALYZE "{proposal["table"]}"')
+        proposal["build_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        after = sum(time_query(conn, sql, repeats) for sql in proposal["queries"])
+
+        proposal["before_ms"] = round(before, 2)
+        proposal["after_ms"] = round(after, 2)
+        proposal["measured_speedup"] = round(before / max(after, 1e-6), 1)
+        proposal["applied"] = apply and after < before
+        if not proposal["applied"]:
+            conn.execute("ROLLBACK TO proposal")
+        conn.execute("RELEASE proposal")
+        report.append(proposal)
+    conn.close()
+    return report
+
+def read_workload(path: str) -> List[tuple]:
+    # JSONL query log written by the server (QUERY_LOG_PATH), or one query per line
+    counts = Counter()
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            sql = json.loads(line)["query"] if line.startswith("{") else line
+            counts[sql.strip().rstrip(";")] += 1
+    return list(counts.items())
+
+def main():
+    parser = argparse.ArgumentParser(description="Propose (and optionally apply) covering indexes for a query workload")
+    parser.add_argument("workload", help="query log (JSONL from QUERY_LOG_PATH, or one query per line)")
+    parser.add_argument("--db", default="sample.db")
+    parser.add_argument("--apply", action="store_true", help="keep indexes that made their queries faster")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    report = evaluate(args.db, read_workload(args.workload), args.apply, args.repeats)
+    if not report:
+        print("No full scans on filtered or joined columns found.")
+    for proposal in report:
+        status = "applied" if proposal["applied"] else "not applied"
+        print(f"\n{proposal['sql']} ({status})")
+        print(f"  {len(proposal['queries'])} queries, {proposal['executions']} executions")
+        print(f"  estimated speedup {proposal['estimated_speedup']}x, measured {proposal['measured_speedup']}x "
+              f"({proposal['before_ms']} ms -> {proposal['after_ms']} ms, built in {proposal['build_ms']} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,87 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List, Any
+from typing import Optional, List
+from contextlib import asynccontextmanager
+import asyncio
+import json
 import sqlite3
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
-import re
-from peft import PeftModel
+from transformers import TextIteratorStreamer
+import time
 
-app = FastAPI()
+from config import (
+    ADAPTER_PATH,
+    ADAPTERS,
+    ADVISOR_MAX_QUERIES,
+    ASK_LATENCY_BUDGET_MS,
+    ASK_MAX_ATTEMPTS,
+    BASE_MODEL_ID,
+    CPU_DTYPE,
+    CPU_INTEROP_THREADS,
+    CPU_THREADS,
+    DATABASE_PATH,
+    DB_CACHE_SIZE_KB,
+    DB_MMAP_SIZE,
+    DB_MAX_STREAMS,
+    DB_POOL_SIZE,
+    DB_POOL_WAIT_MS,
+    DB_STATEMENT_CACHE,
+    DEVICE,
+    DRAFT_ADAPTER_PATH,
+    DRAFT_MODEL_ID,
+    EXPORT_BATCH_SIZE,
+    INFERENCE_PRECISION,
+    MAX_BATCH_SIZE,
+    MAX_EXPORT_ROWS,
+    MAX_LOADED_ADAPTERS,
+    MAX_QUERY_COST,
+    MAX_RESULT_ROWS,
+    MAX_WAIT_MS,
+    MERGED_MODEL_PATH,
+    MODEL_PRELOAD,
+    MODEL_WARMUP,
+    NUM_ASSISTANT_TOKENS,
+    PAGE_SIZE,
+    PREFIX_CACHE_SIZE,
+    QUERY_LOG_PATH,
+    QUERY_TIMEOUT_MS,
+    RESULT_CACHE_PATH,
+    RESULT_CACHE_SIZE,
+    RESULT_CACHE_TTL,
+    SCHEMA_LINK_MAX_TABLES,
+    SCHEMA_LINKING,
+    SAFETENSORS_MMAP,
+    TORCH_COMPILE,
+    VALIDATION_RETRIES,
+)
+from adapters import DEFAULT_ADAPTER, AdapterError, AdapterRegistry
+from database import ConnectionPool, PoolTimeout
+from export import arrow_stream, declared_types, first_batch, parquet_bytes
+from generation import GENERATION_KWARGS, build_prompt, generate_batch, prompt_prefix
+from index_advisor import IndexAdvisor
+from model_loading import configure_cpu, load_model, resolve_device
+from model_registry import ModelRegistry
+from prefix_cache import PrefixCache
+from result_cache import GenerationCache
+from scheduler import BatchScheduler
+from schema_catalog import SchemaCatalog
+from speculative import SPECULATIVE_STATS, acceptance_rate, generate_speculative
+from stopping import DECODE_STATS, token_budget
+from validation import SQLValidationError, SQLValidator
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The port is bound right away; the model loads in the background and /ready
+    # reports when it can serve
+    if MODEL_PRELOAD:
+        models.start()
+    yield
+    await scheduler.stop()
+    db_pool.close()
+    index_advisor.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS configuration
 app.add_middleware(
@@ -17,138 +90,492 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Truncated"],
 )
 
-# Load model and tokenizer
-print("Loading model...")
+@app.exception_handler(PoolTimeout)
+async def pool_timeout(request, e: PoolTimeout):
+    # Every connection is busy (e.g. held by slow streaming clients): ask the client to retry
+    return JSONResponse({"detail": str(e)}, status_code=503)
 
-base_model_id = "meta-llama/Llama-3.2-3B-Instruct"
-adapter_path = "../sql-assistant-final"
+def load_served_model() -> dict:
+    # Runs on a worker thread, so importing this module stays cheap
+    print("Loading model...")
+    base_model_id = BASE_MODEL_ID
+    adapter_path = ADAPTER_PATH
 
-# Load base model and tokenizer
-tokenizer = AutoTokenizer.from_pretrained(base_model_id)
-model = AutoModelForCausalLM.from_pretrained(
-    base_model_id,
-    device_map="auto",
-    torch_dtype=torch.float16,
-)
+    # Thread settings have to be in place before the first parallel op
+    if INFERENCE_PRECISION == "cpu-int8" or resolve_device(DEVICE) == "cpu":
+        print(f"CPU threads: {configure_cpu(CPU_THREADS, CPU_INTEROP_THREADS)}")
+
+    # Load base model, tokenizer and PEFT adapter in the configured precision; a merged
+    # checkpoint skips the LoRA layers entirely
+    load_options = {"device": DEVICE, "cpu_dtype": CPU_DTYPE, "compile": TORCH_COMPILE, "mmap": SAFETENSORS_MMAP}
+    if MERGED_MODEL_PATH:
+        adapter_path = MERGED_MODEL_PATH
+        model, tokenizer, model_info = load_model(MERGED_MODEL_PATH, None, INFERENCE_PRECISION, **load_options)
+    else:
+        model, tokenizer, model_info = load_model(base_model_id, adapter_path, INFERENCE_PRECISION, **load_options)
+    print(f"Loaded {INFERENCE_PRECISION} model on {model_info['device']} in {model_info['load_seconds']}s ({model_info['footprint_mb']} MB of weights)")
+    print("Model loaded!")
 
-# Add PEFT adapter loading
-model = PeftModel.from_pretrained(model, adapter_path)
-print("Model loaded!")
-
-# Database schema
-SCHEMA = """
-TABLE STRUCTURES:
-
-1. Projects
-   - project_id: INTEGER PRIMARY KEY
-   - name: TEXT NOT NULL
-   - department: TEXT NOT NULL
-   - budget: INTEGER NOT NULL
-
-2. Teams
-   - team_id: INTEGER PRIMARY KEY
-   - name: TEXT NOT NULL
-
-3. Students
-   - student_id: INTEGER PRIMARY KEY
-   - name: TEXT NOT NULL
-   - team_id: INTEGER NOT NULL (references Teams.team_id)
-   - project_id: INTEGER (references Projects.project_id)
-   - grade: FLOAT DEFAULT 0.0
-   - enrollment_date: DATE NOT NULL
-
-4. TimeEntries
-   - entry_id: INTEGER PRIMARY KEY
-   - student_id: INTEGER NOT NULL (references Students.student_id)
-   - hours: INTEGER NOT NULL
-   - task_date: DATE NOT NULL
-   - task_type: TEXT NOT NULL
-"""
+    draft_model = None
+    if DRAFT_MODEL_ID:
+        draft_model, _, draft_info = load_model(DRAFT_MODEL_ID, DRAFT_ADAPTER_PATH, INFERENCE_PRECISION, **load_options)
+        print(f"Loaded draft model {DRAFT_MODEL_ID} in {draft_info['load_seconds']}s ({draft_info['footprint_mb']} MB of weights)")
+
+    return {
+        "model": model,
+        "tokenizer": tokenizer,
+        "model_info": model_info,
+        # Other adapters for the same base model are swapped into it on demand
+        "adapters": AdapterRegistry(model, adapter_path, ADAPTERS, MAX_LOADED_ADAPTERS),
+        "draft_model": draft_model,
+    }
+
+def warm_up(models: ModelRegistry):
+    # A short generation allocates the kernels (and compiles, with TORCH_COMPILE)
+    # and prefills the cached schema prefix before the first real request
+    question = "How many students are there?"
+    schema = linked_schema(db_pool.call(schema_catalog.refresh), question)
+    generate_prompts([build_prompt(question, schema)], [8], prefixes=[prompt_prefix(schema)])
+
+models = ModelRegistry(load_served_model, warm_up if MODEL_WARMUP else None)
+
+async def served_model() -> ModelRegistry:
+    try:
+        return await models.ready()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 class Query(BaseModel):
     question: str
     previous_error: Optional[str] = None
     previous_query: Optional[str] = None
+    # One of the configured ADAPTERS, the default adapter if omitted
+    adapter: Optional[str] = None
+
+class AskRequest(BaseModel):
+    question: str
+    adapter: Optional[str] = None
+    max_attempts: Optional[int] = None
+    page_size: Optional[int] = None
+
+class SQLQuery(BaseModel):
+    query: str
+    page_size: Optional[int] = None
+    cursor: Optional[str] = None
+    stream: bool = False
+    # "json", or "arrow" / "parquet" for columnar exports
+    format: str = "json"
+
+# The schema preamble is prefilled once and reused by every first-attempt prompt.
+# Entries are keyed on the rendered schema, so with SCHEMA_LINKING each linked
+# table set is its own entry and questions about the same tables share it
+prefix_cache = PrefixCache(PREFIX_CACHE_SIZE)
+
+def generate_prompts(prompts: List[str], budgets: Optional[List[int]] = None, adapter: str = DEFAULT_ADAPTER, prefixes: Optional[List[str]] = None, **generation_kwargs) -> List[str]:
+    # Runs on the generation thread, so swapping the adapter can't race another batch
+    models.adapters.activate(adapter)
+    if models.draft_model is not None and len(prompts) == 1:
+        # Drafting pays off when a request decodes alone; batched rows already share each step
+        budget = budgets[0] if budgets else None
+        response, _ = generate_speculative(
+            prompts[0], models.model, models.draft_model, models.tokenizer, budget, NUM_ASSISTANT_TOKENS, **generation_kwargs
+        )
+        return [response]
+    if PREFIX_CACHE_SIZE <= 0:
+        return generate_batch(prompts, models.model, models.tokenizer, budgets, **generation_kwargs)
+    # One generate call per distinct prefix, each on its cached past_key_values
+    prefixes = prefixes or [prompt_prefix(schema_catalog.text)] * len(prompts)
+    groups = {}
+    for i, prefix in enumerate(prefixes):
+        groups.setdefault(prefix, []).append(i)
+    results = [None] * len(prompts)
+    for prefix, rows in groups.items():
+        outputs = prefix_cache.generate_prompts(
+            [prompts[i] for i in rows], prefix, models.model, models.tokenizer, models.adapters.paths[adapter],
+            [budgets[i] for i in rows] if budgets else None, **generation_kwargs
+        )
+        for i, output in zip(rows, outputs):
+            results[i] = output
+    return results
+
+def generate_requests(requests: List[tuple]) -> List[str]:
+    # Each request is an (adapter, prompt, token budget, schema prefix) tuple;
+    # the scheduler only batches requests for the same adapter
+    adapter_names, prompts, budgets, prefixes = zip(*requests)
+    return generate_prompts(list(prompts), list(budgets), adapter_names[0], list(prefixes))
+
+# Concurrent /query calls are padded into shared generate batches
+scheduler = BatchScheduler(
+    generate_requests,
+    max_batch_size=MAX_BATCH_SIZE,
+    max_wait_ms=MAX_WAIT_MS,
+    key=lambda request: request[0],
+)
+
+def model_identity() -> str:
+    # Different precisions can decode differently, so they don't share cached SQL;
+    # cache keys carry the adapter name, so every adapter's weights count here
+    fingerprints = ",".join(f"{name}={fingerprint}" for name, fingerprint in models.adapters.fingerprints.items())
+    return f"{fingerprints}|{INFERENCE_PRECISION}|{models.model_info['dtype']}|linking={SCHEMA_LINKING}"
+
+# Prompt schema text, introspected from the served database instead of kept in
+# sync with create_db.py by hand
+schema_catalog = SchemaCatalog(SCHEMA_LINK_MAX_TABLES)
 
-def clean_response(response: str) -> str:
+async def current_schema() -> SchemaCatalog:
+    # One PRAGMA read; the schema is only introspected again after DDL
+    return await db_pool.run(db_pool.call, schema_catalog.refresh)
+
+def linked_schema(catalog: SchemaCatalog, question: str) -> str:
+    # With SCHEMA_LINKING, prompts only describe the tables the question needs
+    return catalog.linker.prompt_schema(question) if SCHEMA_LINKING else catalog.text
+
+async def prompt_schema(question: str) -> str:
+    return linked_schema(await current_schema(), question)
+
+# Repeated questions skip generation entirely
+result_cache = GenerationCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL, RESULT_CACHE_PATH)
+
+# With RESULT_CACHE_PATH the cache reads and writes SQLite, so it is only used off the event loop
+async def cache_lookup(question: str, previous_error: Optional[str] = None, previous_query: Optional[str] = None, **generation_kwargs):
+    # Returns (cache key, cached SQL or None)
+    schema = await current_schema()
+
+    def lookup():
+        # Rebinding is a no-op unless the schema or adapter changed underneath us
+        result_cache.bind(schema.fingerprint, model_identity())
+        key = result_cache.make_key(question, previous_error, previous_query, **generation_kwargs)
+        return key, result_cache.get(key)
+    return await asyncio.to_thread(lookup)
+
+async def cache_store(key: str, sql_query: str):
+    await asyncio.to_thread(result_cache.put, key, sql_query)
+
+async def generate_validated(question: str, previous_error: Optional[str] = None, previous_query: Optional[str] = None, adapter: str = DEFAULT_ADAPTER):
+    # One generation attempt: returns (sql, validation error or None, timings)
+    start = time.perf_counter()
+    schema = await prompt_schema(question)
+    prompt = build_prompt(question, schema, previous_error, previous_query)
+    sql_query = await scheduler.submit((adapter, prompt, token_budget(question, previous_query), prompt_prefix(schema)))
+    print(f"Raw response: {sql_query}")
+    generated = time.perf_counter()
+
+    validation_error = await validate_sql(sql_query)
+    if validation_error is not None:
+        print(f"Validation error: {validation_error}")
+    timings = {
+        "generate_ms": round((generated - start) * 1000, 1),
+        "validate_ms": round((time.perf_counter() - generated) * 1000, 1),
+    }
+    return sql_query, validation_error, timings
+
+@app.post("/query")
+async def process_query(query: Query):
+    await served_model()
     try:
-        print("Starting cleaning...")
-        # Take everything after the last [/INST] tag
-        if "[/INST]" in response:
-            response = response.split("[/INST]")[-1].strip()
-            if ";" in response:
-                response = response.split(";")[0].strip() + ";"
-            
-        print(f"Cleaned response: {response}")
-        return response
-        
+        adapter = models.adapters.resolve(query.adapter)
+    except AdapterError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        cache_key, sql_query = await cache_lookup(
+            query.question, query.previous_error, query.previous_query, adapter=adapter, **GENERATION_KWARGS
+        )
+        if sql_query is not None:
+            return {"sql_query": sql_query, "cached": True}
+
+        sql_query, validation_error, _ = await generate_validated(
+            query.question, query.previous_error, query.previous_query, adapter
+        )
+
+        # Invalid SQL is repaired here rather than through another round trip from the browser
+        for _ in range(VALIDATION_RETRIES):
+            if validation_error is None:
+                break
+            sql_query, validation_error, _ = await generate_validated(query.question, validation_error, sql_query, adapter)
+
+        if validation_error is None:
+            await cache_store(cache_key, sql_query)
+        return {"sql_query": sql_query, "cached": False, "validation_error": validation_error}
+    except PoolTimeout:
+        raise
     except Exception as e:
-        print(f"Error in clean_response: {str(e)}")
-        return response.strip()
+        raise HTTPException(status_code=500, detail=str(e))
 
-def generate_sql(question: str, previous_error: Optional[str] = None, previous_query: Optional[str] = None) -> str:
-    if previous_error and previous_query:
-        base_prompt = f"""[INST]Fix this SQL query:
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-Previous query: {previous_query}
-Error: {previous_error}
+@app.post("/query/stream")
+async def stream_query(query: Query):
+    await served_model()
+    try:
+        adapter = models.adapters.resolve(query.adapter)
+    except AdapterError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-CRITICAL: Output only the fixed SQL query.[/INST]"""
-    else:
-        base_prompt = f"""[INST]
-Based on the following database schema:
-{SCHEMA}
-
-Write one SQL query for this question: {question}
-
-CRITICAL: Output only the SQL query.
-[/INST]"""
-
-    inputs = tokenizer(base_prompt, return_tensors="pt").to("cuda")
-    outputs = model.generate(
-        **inputs,
-        max_new_tokens=700,
-        temperature=0.1,
-        do_sample=True,
-        num_return_sequences=1,
-        repetition_penalty=1.2,
-        eos_token_id=tokenizer.eos_token_id,
-        pad_token_id=tokenizer.eos_token_id
+    cache_key, cached = await cache_lookup(
+        query.question, query.previous_error, query.previous_query, adapter=adapter, **GENERATION_KWARGS
     )
-    
-    response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    print(f"Raw response: {response}")
-    return response.split("[/INST]")[-1].strip()
+    if cached is not None:
+        async def replay():
+            yield sse("token", {"text": cached})
+            yield sse("done", {"sql_query": cached, "cached": True})
+        return StreamingResponse(replay(), media_type="text/event-stream")
 
-@app.post("/query")
-async def process_query(query: Query):
+    schema = await prompt_schema(query.question)
+    prompt = build_prompt(query.question, schema, query.previous_error, query.previous_query)
+    budget = token_budget(query.question, query.previous_query)
+    streamer = TextIteratorStreamer(models.tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+    def run():
+        try:
+            return generate_prompts([prompt], [budget], adapter, [prompt_prefix(schema)], streamer=streamer)[0]
+        finally:
+            # Unblock the reader even if generate() failed
+            streamer.end()
+
+    # Shares the scheduler's thread so streamed and batched generations never overlap
+    generation = asyncio.get_running_loop().run_in_executor(scheduler.executor, run)
+
+    async def events():
+        chunks = iter(streamer)
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            yield sse("token", {"text": chunk})
+
+        # The final query has any ```sql fence removed
+        try:
+            sql_query = await generation
+        except Exception as e:
+            yield sse("error", {"detail": str(e)})
+            return
+        print(f"Streamed response: {sql_query}")
+
+        # The text is already on screen, so problems are reported rather than repaired
+        validation_error = await validate_sql(sql_query)
+        if validation_error is None:
+            await cache_store(cache_key, sql_query)
+        yield sse("done", {"sql_query": sql_query, "cached": False, "validation_error": validation_error})
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/stats")
+async def stats():
+    return {
+        "scheduler": scheduler.stats,
+        "result_cache": result_cache.info(),
+        "prefix_cache": prefix_cache.info(),
+        "decoding": DECODE_STATS,
+        "schema": schema_catalog.info(),
+        "speculative": {**SPECULATIVE_STATS, "acceptance_rate": acceptance_rate(SPECULATIVE_STATS), "draft_model": DRAFT_MODEL_ID},
+        "model": {**models.info(), **(models.model_info if models.is_ready else {})},
+        "adapters": models.adapters.info() if models.is_ready else None,
+    }
+
+@app.get("/health")
+async def health():
+    # Liveness only: answers while the model is still loading
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    # With MODEL_PRELOAD=0 the first generation request loads the model, so an
+    # idle worker still counts as ready
+    is_ready = models.is_ready or (not MODEL_PRELOAD and models.state == "idle")
+    return JSONResponse({"ready": is_ready, **models.info()}, status_code=200 if is_ready else 503)
+
+# Generated SQL runs on pooled read-only connections, off the event loop
+db_pool = ConnectionPool(
+    DATABASE_PATH,
+    size=DB_POOL_SIZE,
+    timeout_ms=QUERY_TIMEOUT_MS,
+    mmap_size=DB_MMAP_SIZE,
+    cache_size_kb=DB_CACHE_SIZE_KB,
+    statement_cache=DB_STATEMENT_CACHE,
+    wait_ms=DB_POOL_WAIT_MS,
+    max_streams=DB_MAX_STREAMS,
+)
+
+# Catches malformed, non-SELECT, Cartesian or too expensive SQL before it runs
+sql_validator = SQLValidator(MAX_QUERY_COST)
+
+async def validate_sql(sql: str) -> Optional[str]:
+    # Returns the reason the query may not run, or None
+    try:
+        await db_pool.run(db_pool.call, lambda conn: sql_validator.validate(conn, sql, schema_catalog.refresh(conn).columns))
+        return None
+    except SQLValidationError as e:
+        return str(e)
+
+# Successful queries feed the index advisor (GET /index-advice)
+index_advisor = IndexAdvisor(ADVISOR_MAX_QUERIES, QUERY_LOG_PATH)
+
+async def iterate_in_pool(items):
+    # Drives a blocking generator from the pool's threads and always closes it
+    try:
+        while True:
+            item = await db_pool.run(next, items, None)
+            if item is None:
+                break
+            yield item
+    finally:
+        await db_pool.run(items.close)
+
+async def stream_rows(rows):
+    # NDJSON: a columns line, one JSON array per row, then a summary line
     try:
-        sql_query = generate_sql(
-            query.question,
-            query.previous_error,
-            query.previous_query
+        async for item in iterate_in_pool(rows):
+            if "rows" in item:
+                yield "".join(json.dumps(row, default=str) + "\n" for row in item["rows"])
+            else:
+                yield json.dumps(item) + "\n"
+    except sqlite3.Error as e:
+        print(f"SQLite error: {str(e)}")
+        yield json.dumps({"error": f"SQLite error: {str(e)}"}) + "\n"
+
+async def export_results(query: SQLQuery):
+    types = await db_pool.run(db_pool.call, lambda conn: declared_types(query.query, schema_catalog.refresh(conn).columns))
+    rows = db_pool.iter_rows(query.query, batch_size=EXPORT_BATCH_SIZE, max_rows=MAX_EXPORT_ROWS)
+    header = await db_pool.run(next, rows)
+
+    if query.format == "parquet":
+        try:
+            data, summary = await db_pool.run(parquet_bytes, header["columns"], rows, types)
+        finally:
+            await db_pool.run(rows.close)
+        # Like the JSON formats, say when MAX_EXPORT_ROWS cut the result short
+        return Response(
+            data,
+            media_type="application/vnd.apache.parquet",
+            headers={
+                "Content-Disposition": 'attachment; filename="results.parquet"',
+                "X-Truncated": str(bool(summary.get("truncated"))).lower(),
+            },
         )
-        return {"sql_query": sql_query}
+
+    # Conversion errors in the first batch still become a 400
+    try:
+        batches, first = await db_pool.run(first_batch, header["columns"], rows, types)
+    except Exception:
+        await db_pool.run(rows.close)
+        raise
+
+    async def body():
+        try:
+            async for chunk in iterate_in_pool(arrow_stream(batches, first, rows)):
+                yield chunk
+        finally:
+            await db_pool.run(rows.close)
+
+    # Streamed, so truncation is reported in the custom metadata of the stream's last, empty batch
+    return StreamingResponse(body(), media_type="application/vnd.apache.arrow.stream")
+
+@app.post("/ask")
+async def ask(request: AskRequest):
+    """Generates, validates and runs SQL for a question, repairing it on errors.
+
+    Stops after ``max_attempts`` or once ASK_LATENCY_BUDGET_MS has been spent,
+    and reports how long each attempt spent generating, validating and executing.
+    """
+    await served_model()
+    try:
+        adapter = models.adapters.resolve(request.adapter)
+    except AdapterError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    max_attempts = max(1, request.max_attempts or ASK_MAX_ATTEMPTS)
+    page_size = max(1, min(request.page_size or PAGE_SIZE, MAX_RESULT_ROWS))
+    deadline = time.perf_counter() + ASK_LATENCY_BUDGET_MS / 1000
+    attempts = []
+    sql_query, error = None, None
+
+    try:
+        cache_key, cached = await cache_lookup(request.question, adapter=adapter, **GENERATION_KWARGS)
+
+        while len(attempts) < max_attempts and (not attempts or time.perf_counter() < deadline):
+            if not attempts and cached is not None:
+                sql_query, error, timings = cached, None, {"generate_ms": 0.0, "validate_ms": 0.0}
+            else:
+                # Repairs only carry the failing query and its error, never the schema again
+                sql_query, error, timings = await generate_validated(request.question, error, sql_query, adapter)
+
+            page = None
+            if error is None:
+                start = time.perf_counter()
+                try:
+                    page = await db_pool.run(db_pool.fetch_page, sql_query, page_size, None, MAX_RESULT_ROWS)
+                except sqlite3.Error as e:
+                    error = f"SQLite error: {str(e)}"
+                    print(error)
+                timings["execute_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                if page is not None:
+                    index_advisor.record(sql_query, timings["execute_ms"])
+
+            attempts.append({"sql_query": sql_query, "error": error, **timings})
+            if page is not None:
+                await cache_store(cache_key, sql_query)
+                return {"sql_query": sql_query, **page, "attempts": attempts}
+    except PoolTimeout:
+        raise
     except Exception as e:
+        print(f"Unexpected error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    raise HTTPException(status_code=422, detail={"error": error, "sql_query": sql_query, "attempts": attempts})
+
+@app.get("/index-advice")
+async def index_advice():
+    try:
+        return {"proposals": await db_pool.run(db_pool.call, index_advisor.recommend)}
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"SQLite error: {str(e)}")
+
 @app.post("/execute-query")
-async def execute_query(query: dict):
+async def execute_query(query: SQLQuery):
     try:
         # Print query for debugging
-        print(f"Executing query: {query['query']}")
-        
-        conn = sqlite3.connect('sample.db')
-        cursor = conn.cursor()
-        cursor.execute(query["query"])
-        results = cursor.fetchall()
-        conn.close()
-        return {"results": results}
+        print(f"Executing query: {query.query}")
+
+        validation_error = await validate_sql(query.query)
+        if validation_error is not None:
+            raise SQLValidationError(validation_error)
+
+        if query.format in ("arrow", "parquet"):
+            return await export_results(query)
+        if query.format != "json":
+            raise ValueError(f"unknown format '{query.format}'")
+
+        if query.stream:
+            rows = db_pool.iter_rows(query.query, max_rows=MAX_RESULT_ROWS)
+            # Pull the column line here so SQL errors still become a 400
+            header = await db_pool.run(next, rows)
+
+            async def body():
+                yield json.dumps(header) + "\n"
+                async for chunk in stream_rows(rows):
+                    yield chunk
+
+            return StreamingResponse(body(), media_type="application/x-ndjson")
+
+        page_size = max(1, min(query.page_size or PAGE_SIZE, MAX_RESULT_ROWS))
+        start = time.perf_counter()
+        page = await db_pool.run(db_pool.fetch_page, query.query, page_size, query.cursor, MAX_RESULT_ROWS)
+        index_advisor.record(query.query, (time.perf_counter() - start) * 1000)
+        return page
     except sqlite3.Error as e:
         print(f"SQLite error: {str(e)}")
         raise HTTPException(status_code=400, detail=f"SQLite error: {str(e)}")
+    except SQLValidationError as e:
+        print(f"Validation error: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Validation error: {str(e)}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PoolTimeout:
+        raise
     except Exception as e:
         print(f"Unexpected error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
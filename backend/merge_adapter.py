@@ -0,0 +1,109 @@
+import argparse
+import time
+
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+from peft import PeftModel
+
+from generation import build_prompt
+
+DTYPES = {"float16": torch.float16, "bfloat16": torch.bfloat16, "float32": torch.float32}
+
+# Not part of the finetuning data, used to check the merged weights generate the same SQL
+HELD_OUT_QUESTIONS = [
+    "Which students have logged more than 10 hours in total?",
+    "List every project together with the number of students on it",
+    "What is the average grade of the students in each team?",
+    "Which department has the largest total project budget?",
+    "Find students who have never logged a time entry",
+    "Show the five most recent time entries with the student names",
+    "How many hours were spent on each task type in February 2024?",
+    "Which team has the most students enrolled after 2023-06-01?",
+]
+
+def load_unmerged(base_model_id: str, adapter_path: str, dtype: torch.dtype):
+    model = AutoModelForCausalLM.from_pretrained(base_model_id, device_map="auto", torch_dtype=dtype)
+    return PeftModel.from_pretrained(model, adapter_path).eval()
+
+def merge_adapter(base_model_id: str, adapter_path: str, output_path: str, dtype: str = "float16"):
+    """Folds the LoRA weights into the base model and saves a standalone checkpoint."""
+    # Merge on the CPU so the full-precision copy never has to fit next to the served model
+    model = AutoModelForCausalLM.from_pretrained(base_model_id, torch_dtype=DTYPES[dtype])
+    model = PeftModel.from_pretrained(model, adapter_path).merge_and_unload()
+    model.save_pretrained(output_path, safe_serialization=True)
+    AutoTokenizer.from_pretrained(base_model_id).save_pretrained(output_path)
+    print(f"Saved merged {dtype} checkpoint to {output_path}")
+
+def greedy_sql(model, tokenizer, question: str, max_new_tokens: int):
+    inputs = tokenizer(build_prompt(question), return_tensors="pt").to(model.device)
+    with torch.inference_mode():
+        logits = model(**inputs).logits[0, -1].float()
+        start = time.perf_counter()
+        outputs = model.generate(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            pad_token_id=tokenizer.eos_token_id,
+        )
+        elapsed = time.perf_counter() - start
+    text = tokenizer.decode(outputs[0, inputs["input_ids"].shape[1]:], skip_special_tokens=True)
+    return text.strip(), logits.cpu(), elapsed
+
+def compare(unmerged, merged, tokenizer, questions, max_new_tokens: int = 128) -> dict:
+    """Greedy-decodes every question with both models and compares output and latency."""
+    matches = 0
+    max_logit_diff = 0.0
+    timings = {"unmerged": 0.0, "merged": 0.0}
+    for question in questions:
+        expected, expected_logits, unmerged_seconds = greedy_sql(unmerged, tokenizer, question, max_new_tokens)
+        actual, actual_logits, merged_seconds = greedy_sql(merged, tokenizer, question, max_new_tokens)
+        timings["unmerged"] += unmerged_seconds
+        timings["merged"] += merged_seconds
+        max_logit_diff = max(max_logit_diff, (expected_logits - actual_logits).abs().max().item())
+        if expected == actual:
+            matches += 1
+        else:
+            print(f"Mismatch for '{question}':\n  unmerged: {expected}\n  merged:   {actual}")
+    return {
+        "questions": len(questions),
+        "matches": matches,
+        "max_logit_diff": round(max_logit_diff, 4),
+        "unmerged_ms": round(1000 * timings["unmerged"] / len(questions), 1),
+        "merged_ms": round(1000 * timings["merged"] / len(questions), 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the LoRA adapter into the base model for serving")
+    parser.add_argument("--model", default="meta-llama/Llama-3.2-3B-Instruct")
+    parser.add_argument("--adapter", default="../sql-assistant-final")
+    parser.add_argument("--output", default="../sql-assistant-merged")
+    parser.add_argument("--dtype", default="float16", choices=list(DTYPES))
+    parser.add_argument("--questions", help="file with one held-out question per line")
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--skip-check", action="store_true", help="only merge, skip the parity check")
+    args = parser.parse_args()
+
+    merge_adapter(args.model, args.adapter, args.output, args.dtype)
+    if args.skip_check:
+        return
+
+    questions = HELD_OUT_QUESTIONS
+    if args.questions:
+        with open(args.questions) as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    tokenizer = AutoTokenizer.from_pretrained(args.output)
+    unmerged = load_unmerged(args.model, args.adapter, DTYPES[args.dtype])
+    merged = AutoModelForCausalLM.from_pretrained(args.output, device_map="auto", torch_dtype=DTYPES[args.dtype]).eval()
+    # Warm both models up so the first question doesn't skew the latency numbers
+    greedy_sql(unmerged, tokenizer, questions[0], 4)
+    greedy_sql(merged, tokenizer, questions[0], 4)
+
+    report = compare(unmerged, merged, tokenizer, questions, args.max_new_tokens)
+    print(f"Identical SQL for {report['matches']}/{report['questions']} held-out questions")
+    print(f"Largest next-token logit difference: {report['max_logit_diff']}")
+    print(f"Average generate latency: unmerged {report['unmerged_ms']} ms, merged {report['merged_ms']} ms")
+    print(f"Serve it with MERGED_MODEL_PATH={args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import time
+from typing import Optional
+
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
+from peft import PeftModel
+
+# fp16: plain half precision (the original setup), int8 / nf4: bitsandbytes on GPU,
+# cpu-int8: fp32 on CPU with the adapter merged and Linear layers dynamically quantized
+PRECISIONS = ("fp16", "int8", "nf4", "cpu-int8")
+
+# Unquantized weights on CPU; fp16 matmuls are slow or missing there, bf16 needs AVX512-BF16/AMX to pay off
+CPU_DTYPES = {"float32": torch.float32, "bfloat16": torch.bfloat16}
+
+def resolve_device(device: str = "auto") -> str:
+    if device == "auto":
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    if device == "cuda" and not torch.cuda.is_available():
+        raise ValueError("DEVICE=cuda but no CUDA device is available")
+    if device not in ("cuda", "cpu"):
+        raise ValueError(f"unknown device '{device}', expected auto, cuda or cpu")
+    return device
+
+def configure_cpu(num_threads: int = 0, interop_threads: int = 0):
+    # 0 keeps torch's default (one intra-op thread per physical core)
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    if interop_threads > 0:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            # Only allowed before the first parallel op runs in this process
+            print(f"Could not set interop threads: {e}")
+    return {"threads": torch.get_num_threads(), "interop_threads": torch.get_num_interop_threads()}
+
+def compile_forward(model):
+    # generate() calls forward on the innermost transformer, LoRA layers included
+    inner = model.get_base_model() if isinstance(model, PeftModel) else model
+    inner.forward = torch.compile(inner.forward, dynamic=True)
+    return model
+
+def quantization_config(precision: str):
+    if precision == "int8":
+        return BitsAndBytesConfig(load_in_8bit=True)
+    if precision == "nf4":
+        # Same settings the finetune scripts train against
+        return BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_compute_dtype=torch.float16,
+            bnb_4bit_use_double_quant=True,
+        )
+    return None
+
+def model_footprint(model) -> int:
+    # get_memory_footprint() misses dynamically quantized weights, which live in packed params
+    def size(value):
+        if isinstance(value, (tuple, list)):
+            return sum(size(item) for item in value)
+        if torch.is_tensor(value):
+            return value.numel() * value.element_size()
+        return 0
+    return sum(size(value) for value in model.state_dict().values())
+
+def load_model(
+    base_model_id: str,
+    adapter_path: Optional[str],
+    precision: str = "fp16",
+    device: str = "auto",
+    cpu_dtype: str = "float32",
+    compile: bool = False,
+    mmap: bool = True,
+):
+    """Loads the tokenizer and adapter-wrapped model in the requested precision.
+
+    Pass ``adapter_path=None`` for checkpoints that already have the adapter
+    merged in (see merge_adapter.py). On CPU the fp16 precision loads
+    unquantized weights in ``cpu_dtype`` instead. Safetensors checkpoints are
+    memory-mapped unless ``mmap`` is False. Returns ``(model, tokenizer,
+    info)`` where info holds the precision, device, load time and weight footprint.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"unknown precision '{precision}', expected one of {', '.join(PRECISIONS)}")
+    device = "cpu" if precision == "cpu-int8" else resolve_device(device)
+    if device == "cpu" and precision in ("int8", "nf4"):
+        raise ValueError(f"{precision} needs bitsandbytes on a CUDA device, use cpu-int8 on CPU")
+
+    start = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(base_model_id)
+    # Some network filesystems stall on mmap page faults
+    load_kwargs = {} if mmap else {"disable_mmap": True}
+    if precision == "cpu-int8":
+        model = AutoModelForCausalLM.from_pretrained(base_model_id, torch_dtype=torch.float32, **load_kwargs)
+        # Dynamic quantization needs plain Linear layers, so the LoRA weights are merged first
+        if adapter_path:
+            model = PeftModel.from_pretrained(model, adapter_path).merge_and_unload()
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    elif device == "cpu":
+        model = AutoModelForCausalLM.from_pretrained(base_model_id, torch_dtype=CPU_DTYPES[cpu_dtype], **load_kwargs)
+        if adapter_path:
+            model = PeftModel.from_pretrained(model, adapter_path)
+    else:
+        model = AutoModelForCausalLM.from_pretrained(
+            base_model_id,
+            device_map="auto",
+            torch_dtype=torch.float16,
+            quantization_config=quantization_config(precision),
+            **load_kwargs,
+        )
+        if adapter_path:
+            model = PeftModel.from_pretrained(model, adapter_path)
+    model.eval()
+    if compile:
+        model = compile_forward(model)
+
+    info = {
+        "precision": precision,
+        "device": device,
+        "dtype": "qint8" if precision == "cpu-int8" else str(model.dtype).replace("torch.", ""),
+        "compiled": compile,
+        "load_seconds": round(time.perf_counter() - start, 2),
+        "footprint_mb": round(model_footprint(model) / 2 ** 20, 1),
+    }
+    return model, tokenizer, info
+
+def measure_throughput(model, tokenizer, prompt: str, new_tokens: int = 32) -> float:
+    # Decode a fixed number of tokens and report tokens/sec
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    start = time.perf_counter()
+    with torch.inference_mode():
+        model.generate(
+            **inputs,
+            max_new_tokens=new_tokens,
+            min_new_tokens=new_tokens,
+            do_sample=False,
+            pad_token_id=tokenizer.eos_token_id,
+        )
+    return new_tokens / (time.perf_counter() - start)
@@ -0,0 +1,65 @@
+import asyncio
+import time
+from typing import Any, Callable, Optional
+
+class ModelRegistry:
+    """Loads the served model off the event loop, once, on first demand.
+
+    ``loader`` returns a dict of the objects the server needs (model,
+    tokenizer, ...), which are then exposed as attributes. ``warmup`` runs
+    once on the loaded objects before the registry reports ready. The API
+    binds its port straight away; generation endpoints ``await ready()``.
+    """
+
+    def __init__(self, loader: Callable[[], dict], warmup: Optional[Callable[["ModelRegistry"], Any]] = None):
+        self.loader = loader
+        self.warmup = warmup
+        self.state = "idle"
+        self.error: Optional[str] = None
+        self.timings = {}
+        self._loaded = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __getattr__(self, name: str):
+        loaded = self.__dict__.get("_loaded", {})
+        if name in loaded:
+            return loaded[name]
+        raise AttributeError(f"'{name}' is not available until the model has loaded")
+
+    def start(self) -> asyncio.Task:
+        # Safe to call repeatedly; a failed load is retried on the next call
+        if self._task is None or (self._task.done() and self.state == "failed"):
+            self._task = asyncio.create_task(self._load())
+        return self._task
+
+    async def ready(self):
+        await asyncio.shield(self.start())
+        if self.state != "ready":
+            raise RuntimeError(f"model failed to load: {self.error}")
+        return self
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state == "ready"
+
+    async def _load(self):
+        try:
+            self.state = "loading"
+            start = time.perf_counter()
+            self._loaded = await asyncio.to_thread(self.loader)
+            self.timings["load_seconds"] = round(time.perf_counter() - start, 2)
+
+            if self.warmup is not None:
+                self.state = "warming"
+                start = time.perf_counter()
+                await asyncio.to_thread(self.warmup, self)
+                self.timings["warmup_seconds"] = round(time.perf_counter() - start, 2)
+            self.error = None
+            self.state = "ready"
+        except Exception as e:
+            print(f"Model loading failed: {str(e)}")
+            self.error = str(e)
+            self.state = "failed"
+
+    def info(self) -> dict:
+        return {"state": self.state, "error": self.error, **self.timings}
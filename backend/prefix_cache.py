@@ -0,0 +1,96 @@
+import copy
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import torch
+
+from generation import decode_responses, generate_batch, with_sql_stopping
+
+class PrefixCache:
+    """Keeps the past_key_values of shared prompt preambles (one per schema).
+
+    Only the question suffix is prefilled per request. Rows in a batch are
+    laid out as ``prefix | padding | suffix`` so the cached prefix can be
+    shared by every row while the padding is masked out.
+    """
+
+    def __init__(self, max_prefixes: int = 4):
+        self.max_prefixes = max_prefixes
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, model, tokenizer, model_key: str, prefix: str):
+        key = (model_key, prefix)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._entries[key]
+
+        prefix_ids = tokenizer(prefix, return_tensors="pt").input_ids.to(model.device)
+        with torch.inference_mode():
+            past_key_values = model(input_ids=prefix_ids, use_cache=True).past_key_values
+
+        with self._lock:
+            self.stats["misses"] += 1
+            self._entries[key] = (prefix_ids, past_key_values)
+            while len(self._entries) > self.max_prefixes:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return prefix_ids, past_key_values
+
+    def generate_batch(self, prefix: str, suffixes: List[str], model, tokenizer, model_key: str = "", budgets: Optional[List[int]] = None, **generation_kwargs) -> List[str]:
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        prefix_ids, cached = self._lookup(model, tokenizer, model_key, prefix)
+
+        # Suffixes are left padded so the padding sits between prefix and question
+        tokenizer.padding_side = "left"
+        suffix = tokenizer(suffixes, return_tensors="pt", padding=True, add_special_tokens=False).to(model.device)
+        batch_size = len(suffixes)
+        input_ids = torch.cat([prefix_ids.expand(batch_size, -1), suffix.input_ids], dim=1)
+        attention_mask = torch.cat([torch.ones_like(prefix_ids).expand(batch_size, -1), suffix.attention_mask], dim=1)
+
+        # generate() extends the cache in place, so every call gets its own copy
+        past_key_values = copy.deepcopy(cached)
+        if batch_size > 1:
+            past_key_values.batch_repeat_interleave(batch_size)
+
+        kwargs, criteria = with_sql_stopping(tokenizer, budgets, generation_kwargs)
+        with torch.inference_mode():
+            outputs = model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                past_key_values=past_key_values,
+                **kwargs,
+                eos_token_id=tokenizer.eos_token_id,
+                pad_token_id=tokenizer.pad_token_id,
+            )
+        if criteria is not None:
+            criteria.record()
+
+        return decode_responses(tokenizer, outputs[:, input_ids.shape[1]:])
+
+    def generate_prompts(self, prompts: List[str], prefix: str, model, tokenizer, model_key: str = "", budgets: Optional[List[int]] = None, **generation_kwargs) -> List[str]:
+        # Prompts that don't start with the cached preamble (e.g. repairs) take the plain path
+        shared = [i for i, prompt in enumerate(prompts) if prompt.startswith(prefix)]
+        other = [i for i, prompt in enumerate(prompts) if not prompt.startswith(prefix)]
+        results = [None] * len(prompts)
+
+        if shared:
+            suffixes = [prompts[i][len(prefix):] for i in shared]
+            shared_budgets = [budgets[i] for i in shared] if budgets else None
+            outputs = self.generate_batch(prefix, suffixes, model, tokenizer, model_key, shared_budgets, **generation_kwargs)
+            for i, result in zip(shared, outputs):
+                results[i] = result
+        if other:
+            other_budgets = [budgets[i] for i in other] if budgets else None
+            outputs = generate_batch([prompts[i] for i in other], model, tokenizer, other_budgets, **generation_kwargs)
+            for i, result in zip(other, outputs):
+                results[i] = result
+        return results
+
+    def info(self) -> dict:
+        return {**self.stats, "size": len(self._entries), "max_prefixes": self.max_prefixes}
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+def normalize_question(question: str) -> str:
+    # Case, spacing and trailing punctuation don't change the SQL we want back
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip("?.! ")
+
+def fingerprint(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+def adapter_fingerprint(adapter_path: str) -> str:
+    # Retraining into the same directory should still look like a new adapter
+    path = os.path.abspath(adapter_path)
+    stamps = []
+    for name in ("adapter_config.json", "adapter_model.safetensors", "adapter_model.bin", "model.safetensors"):
+        weights = os.path.join(path, name)
+        if os.path.exists(weights):
+            stamps.append(f"{name}:{os.path.getmtime(weights)}")
+    return fingerprint(path + "|" + "|".join(stamps))
+
+class GenerationCache:
+    """Bounded LRU/TTL cache of generated SQL, optionally backed by SQLite.
+
+    Entries belong to a namespace made of the schema and adapter fingerprints.
+    Binding a new namespace drops everything cached under the old one.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.namespace = ""
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS generation_cache ("
+                "key TEXT PRIMARY KEY, namespace TEXT NOT NULL, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def bind(self, schema: str, adapter_id: str):
+        namespace = fingerprint(f"{fingerprint(schema)}|{adapter_id}")
+        with self._lock:
+            if namespace == self.namespace:
+                return
+            if self.namespace:
+                self.stats["invalidations"] += 1
+            self.namespace = namespace
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM generation_cache WHERE namespace != ?", (namespace,))
+                self._db.commit()
+
+    def make_key(self, question: str, previous_error: Optional[str] = None, previous_query: Optional[str] = None, **generation_kwargs) -> str:
+        payload = {
+            "namespace": self.namespace,
+            "question": normalize_question(question),
+            "previous_error": previous_error,
+            "previous_query": previous_query,
+            "generation": generation_kwargs,
+        }
+        return fingerprint(json.dumps(payload, sort_keys=True, default=str))
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM generation_cache WHERE key = ? AND namespace = ?",
+                    (key, self.namespace),
+                ).fetchone()
+                if row is not None:
+                    entry = (row[0], row[1])
+                    self._store(key, entry)
+
+            if entry is not None and now - entry[1] > self.ttl:
+                self._drop(key)
+                self.stats["expirations"] += 1
+                entry = None
+
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key: str, value: str):
+        entry = (value, time.time())
+        with self._lock:
+            self._store(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO generation_cache VALUES (?, ?, ?, ?)",
+                    (key, self.namespace, value, entry[1]),
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM generation_cache")
+                self._db.commit()
+
+    def info(self) -> dict:
+        return {**self.stats, "size": len(self._entries), "max_entries": self.max_entries, "namespace": self.namespace}
+
+    def _store(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+            if self._db is not None:
+                self._db.execute("DELETE FROM generation_cache WHERE key = ?", (evicted,))
+
+    def _drop(self, key: str):
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+            self._db.commit()
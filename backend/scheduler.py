@@ -0,0 +1,95 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, List, Optional
+
+class BatchScheduler:
+    """Queues requests and serves them with one batched generate call per step.
+
+    A batch is closed once it reaches ``max_batch_size`` or the oldest request
+    has waited ``max_wait_ms``. Requests that arrive while a batch is decoding
+    are queued and picked up as soon as the worker is free again. With a
+    ``key`` function, each batch is split so only requests with the same key
+    share a generate call.
+    """
+
+    def __init__(self, generate_batch: Callable[[List[Any]], List[str]], max_batch_size: int = 8, max_wait_ms: float = 20.0, key: Optional[Callable[[Any], Hashable]] = None):
+        self.generate_batch = generate_batch
+        self.key = key
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = {"requests": 0, "batches": 0, "largest_batch": 0}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # The model is shared, so batches (and streamed generations) run one at
+        # a time on this dedicated thread
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="generate")
+
+    async def submit(self, request: Any) -> str:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((request, future))
+        return await future
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self.executor.shutdown(wait=False)
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Callers that disconnected while queued don't need a slot
+        return [(request, future) for request, future in batch if not future.done()]
+
+    def _split(self, batch: list) -> List[list]:
+        if self.key is None:
+            return [batch] if batch else []
+        groups = {}
+        for item in batch:
+            groups.setdefault(self.key(item[0]), []).append(item)
+        return list(groups.values())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            collected = await self._collect()
+            for batch in self._split(collected):
+                requests = [request for request, _ in batch]
+                try:
+                    results = await loop.run_in_executor(self.executor, self.generate_batch, requests)
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+
+                self.stats["requests"] += len(batch)
+                self.stats["batches"] += 1
+                self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
@@ -0,0 +1,50 @@
+import sqlite3
+import threading
+
+from result_cache import fingerprint
+from schema_linker import SchemaLinker, introspect, render_schema
+
+class SchemaCatalog:
+    """The served database's schema, introspected once and kept until it changes.
+
+    Every DDL statement bumps ``PRAGMA schema_version``, so ``refresh`` costs
+    one PRAGMA read per call and only re-introspects after the schema (or the
+    database file) changed. ``fingerprint`` identifies the rendered prompt
+    text for downstream caches.
+    """
+
+    def __init__(self, max_link_tables: int = 8):
+        self.max_link_tables = max_link_tables
+        self.version = None
+        self.text = ""
+        self.fingerprint = ""
+        # {table: {column: declared type}}, the same shape as load_schema()
+        self.columns = {}
+        self.linker = None
+        self.stats = {"checks": 0, "introspections": 0}
+        self._lock = threading.Lock()
+
+    def refresh(self, conn: sqlite3.Connection) -> "SchemaCatalog":
+        version = (conn.execute("PRAGMA database_list").fetchone()[2], conn.execute("PRAGMA schema_version").fetchone()[0])
+        with self._lock:
+            self.stats["checks"] += 1
+            if version == self.version:
+                return self
+
+            tables = introspect(conn)
+            self.text = render_schema(tables)
+            self.fingerprint = fingerprint(self.text)
+            self.columns = {table["name"]: {column["name"]: column["type"] for column in table["columns"]} for table in tables}
+            self.linker = SchemaLinker(tables, self.max_link_tables)
+            self.version = version
+            self.stats["introspections"] += 1
+            print(f"Introspected {len(tables)} tables (schema version {version[1]}, fingerprint {self.fingerprint})")
+        return self
+
+    def info(self) -> dict:
+        return {
+            **self.stats,
+            "tables": len(self.columns),
+            "schema_version": self.version[1] if self.version else None,
+            "fingerprint": self.fingerprint,
+        }
@@ -0,0 +1,137 @@
+import math
+import re
+import sqlite3
+from typing import Dict, List, Set
+
+# Question words that say nothing about which table is meant
+STOPWORDS = {
+    "a", "all", "an", "and", "are", "by", "did", "do", "does", "each", "every", "for", "from", "get", "give",
+    "has", "have", "how", "in", "is", "list", "many", "me", "much", "of", "on", "or", "per", "show", "than",
+    "that", "the", "their", "there", "to", "was", "were", "what", "which", "who", "with",
+}
+
+def introspect(conn: sqlite3.Connection) -> List[dict]:
+    """Reads tables, columns and foreign keys from sqlite_master and PRAGMAs."""
+    tables = []
+    names = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY rowid"
+    ).fetchall()
+    for (name,) in names:
+        columns = [
+            {"name": row[1], "type": row[2] or "", "notnull": bool(row[3]), "default": row[4], "pk": bool(row[5])}
+            for row in conn.execute(f'PRAGMA table_info("{name}")')
+        ]
+        foreign_keys = [
+            {"column": row[3], "table": row[2], "to": row[4]}
+            for row in conn.execute(f'PRAGMA foreign_key_list("{name}")')
+        ]
+        tables.append({"name": name, "columns": columns, "foreign_keys": foreign_keys})
+    return tables
+
+def render_schema(tables: List[dict]) -> str:
+    # Same layout as the hand-written SCHEMA the adapters were prompted with
+    references = {}
+    for table in tables:
+        for key in table["foreign_keys"]:
+            references[(table["name"], key["column"])] = f"{key['table']}.{key['to']}"
+
+    blocks = []
+    for number, table in enumerate(tables, 1):
+        lines = [f"{number}. {table['name']}"]
+        for column in table["columns"]:
+            line = f"   - {column['name']}: {column['type']}"
+            if column["pk"]:
+                line += " PRIMARY KEY"
+            if column["notnull"]:
+                line += " NOT NULL"
+            if column["default"] is not None:
+                line += f" DEFAULT {column['default']}"
+            reference = references.get((table["name"], column["name"]))
+            if reference:
+                line += f" (references {reference})"
+            lines.append(line)
+        blocks.append("\n".join(lines))
+    return "\nTABLE STRUCTURES:\n\n" + "\n\n".join(blocks) + "\n"
+
+def terms(text: str) -> Set[str]:
+    # TimeEntries / time_entries / "time entries" all become {"time", "entry"}
+    words = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text)
+    result = set()
+    for word in re.findall(r"[a-z0-9]+", words.lower()):
+        if word in STOPWORDS:
+            continue
+        if word.endswith("ies") and len(word) > 4:
+            word = word[:-3] + "y"
+        elif word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+            word = word[:-1]
+        result.add(word)
+    return result
+
+class SchemaLinker:
+    """Picks the tables a question is about, plus the tables they reference.
+
+    Question terms are matched lexically against table and column names.
+    Terms that appear in most tables (id, name, ...) carry little weight, and a
+    hit on the table name counts double. If nothing matches, the full schema
+    is used.
+    """
+
+    def __init__(self, tables: List[dict], max_tables: int = 8):
+        self.tables = {table["name"]: table for table in tables}
+        self.order = [table["name"] for table in tables]
+        self.max_tables = max_tables
+        self.table_terms = {name: terms(name) for name in self.order}
+        # Foreign key columns are left out: "project" in a question is about
+        # Projects, not every table with a project_id
+        self.column_terms = {}
+        for name, table in self.tables.items():
+            keys = {key["column"] for key in table["foreign_keys"]}
+            self.column_terms[name] = set()
+            for column in table["columns"]:
+                if column["name"] not in keys:
+                    self.column_terms[name] |= terms(column["name"])
+
+        frequency: Dict[str, int] = {}
+        for name in self.order:
+            for term in self.table_terms[name] | self.column_terms[name]:
+                frequency[term] = frequency.get(term, 0) + 1
+        count = len(self.order)
+        self.weights = {term: math.log((count + 1) / seen) for term, seen in frequency.items()}
+
+        # Only outgoing keys: pulling in every table that references a hub
+        # table would bring most of a large schema back
+        self.references = {
+            table["name"]: [key["table"] for key in table["foreign_keys"] if key["table"] in self.tables]
+            for table in tables
+        }
+
+    def scores(self, question: str) -> Dict[str, float]:
+        asked = terms(question)
+        scores = {}
+        for name in self.order:
+            score = sum(2 * self.weights[term] for term in asked & self.table_terms[name])
+            score += sum(self.weights[term] for term in asked & self.column_terms[name] - self.table_terms[name])
+            if score > 0:
+                scores[name] = score
+        return scores
+
+    def link(self, question: str) -> List[str]:
+        scores = self.scores(question)
+        if not scores:
+            return list(self.order)
+
+        selected = sorted(scores, key=scores.get, reverse=True)[:self.max_tables]
+        # Referenced tables make the joins from matched tables expressible
+        for name in list(selected):
+            for referenced in self.references[name]:
+                if referenced not in selected and len(selected) < self.max_tables:
+                    selected.append(referenced)
+        # Tables that link two selected ones (Students between Teams and Projects)
+        for name in self.order:
+            linked = set(self.references[name]) & set(selected)
+            if name not in selected and len(linked) >= 2 and len(selected) < self.max_tables:
+                selected.append(name)
+        return [name for name in self.order if name in selected]
+
+    def prompt_schema(self, question: str) -> str:
+        return render_schema([self.tables[name] for name in self.link(question)])
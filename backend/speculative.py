@@ -0,0 +1,77 @@
+import threading
+from contextlib import contextmanager
+
+import torch
+from peft import PeftModel
+
+from generation import decode_responses, with_sql_stopping
+
+# Totals across speculative requests, served from /stats
+SPECULATIVE_STATS = {"requests": 0, "tokens_generated": 0, "target_steps": 0, "draft_tokens": 0, "accepted_tokens": 0}
+_stats_lock = threading.Lock()
+
+def acceptance_rate(stats: dict) -> float:
+    return round(stats["accepted_tokens"] / stats["draft_tokens"], 3) if stats["draft_tokens"] else 0.0
+
+@contextmanager
+def record_verify_steps(model):
+    """Records the input width of every forward pass the target model runs.
+
+    Each verify step feeds the last accepted token plus the drafted ones (the
+    first step feeds the whole prompt instead), so the widths give the exact
+    number of drafted tokens.
+    """
+    widths = []
+    # generate() calls the innermost transformer, not the PEFT wrapper
+    inner = model.get_base_model() if isinstance(model, PeftModel) else model
+
+    def hook(module, args, kwargs):
+        input_ids = kwargs.get("input_ids")
+        if input_ids is not None:
+            widths.append(input_ids.shape[1])
+    handle = inner.register_forward_pre_hook(hook, with_kwargs=True)
+    try:
+        yield widths
+    finally:
+        handle.remove()
+
+def generate_speculative(prompt: str, model, draft_model, tokenizer, budget=None, num_assistant_tokens: int = 5, **generation_kwargs):
+    """Generates one prompt with ``draft_model`` proposing tokens for ``model`` to verify.
+
+    Returns ``(response, metrics)``. Every target step accepts some drafted
+    tokens and adds one of its own, so accepted = generated - target steps.
+    """
+    # Assisted generation only supports a batch of one, so there is no padding here
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    prompt_length = inputs["input_ids"].shape[1]
+    budgets = [budget] if budget is not None else None
+    kwargs, criteria = with_sql_stopping(tokenizer, budgets, generation_kwargs, prompt_length)
+
+    with record_verify_steps(model) as widths, torch.inference_mode():
+        outputs = model.generate(
+            **inputs,
+            **kwargs,
+            assistant_model=draft_model,
+            num_assistant_tokens=num_assistant_tokens,
+            eos_token_id=tokenizer.eos_token_id,
+            pad_token_id=tokenizer.eos_token_id,
+        )
+    if criteria is not None:
+        criteria.record()
+    generated = outputs.shape[1] - prompt_length
+    target_steps = len(widths)
+    draft_tokens = (widths[0] - prompt_length) + sum(width - 1 for width in widths[1:]) if widths else 0
+
+    metrics = {
+        "tokens_generated": generated,
+        "target_steps": target_steps,
+        "draft_tokens": draft_tokens,
+        "accepted_tokens": max(0, min(draft_tokens, generated - target_steps)),
+    }
+    with _stats_lock:
+        SPECULATIVE_STATS["requests"] += 1
+        for key, value in metrics.items():
+            SPECULATIVE_STATS[key] += value
+    metrics["acceptance_rate"] = acceptance_rate(metrics)
+    print(f"Speculative decode: {generated} tokens in {target_steps} target steps, acceptance {metrics['acceptance_rate']}")
+    return decode_responses(tokenizer, outputs[:, prompt_length:])[0], metrics
@@ -0,0 +1,104 @@
+import threading
+from typing import List, Optional
+
+import torch
+from transformers import StoppingCriteria
+
+# Totals across requests, served from /stats
+DECODE_STATS = {"requests": 0, "tokens_generated": 0, "tokens_saved": 0, "stopped_on_sql": 0}
+_stats_lock = threading.Lock()
+
+def token_budget(question: str, previous_query: Optional[str] = None, ceiling: int = 700) -> int:
+    # Repairs rarely grow much past the query they fix (~3 characters per token)
+    if previous_query:
+        budget = 64 + len(previous_query) * 2 // 3
+    else:
+        budget = 96 + 12 * len(question.split())
+    return max(64, min(ceiling, budget))
+
+def strip_sql_fence(text: str) -> str:
+    # The finetune scripts train on ```sql ... ``` blocks
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.split("```")[0]
+    return text.strip()
+
+class SQLScanner:
+    """Incrementally detects the end of the first SQL statement in a text stream.
+
+    A statement is complete at a ';' outside string literals, or at the
+    closing fence of a ```sql block.
+    """
+
+    def __init__(self):
+        self.quote = None
+        self.backticks = 0
+        self.in_fence = False
+        self.done = False
+
+    def feed(self, text: str) -> bool:
+        for char in text:
+            if self.done:
+                break
+            if self.quote:
+                if char == self.quote:
+                    self.quote = None
+                continue
+
+            if char == "`":
+                self.backticks += 1
+                if self.backticks == 3:
+                    self.backticks = 0
+                    if self.in_fence:
+                        self.done = True
+                    self.in_fence = True
+                continue
+            self.backticks = 0
+
+            if char in ("'", '"'):
+                self.quote = char
+            elif char == ";":
+                self.done = True
+        return self.done
+
+class SQLStoppingCriteria(StoppingCriteria):
+    """Stops each row once it holds a complete statement or runs out of budget."""
+
+    def __init__(self, tokenizer, budgets: List[int], ceiling: int = 700, prompt_length: Optional[int] = None):
+        self.tokenizer = tokenizer
+        self.budgets = budgets
+        self.ceiling = ceiling
+        self.prompt_length = prompt_length
+        self.scanners = [SQLScanner() for _ in budgets]
+        self.generated = [0] * len(budgets)
+        self.finished = [False] * len(budgets)
+        self._seen = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        # Without an explicit prompt length, the first call follows the first new token
+        if self._seen is None:
+            self._seen = self.prompt_length if self.prompt_length is not None else input_ids.shape[1] - 1
+        new_tokens = input_ids[:, self._seen:]
+        self._seen = input_ids.shape[1]
+
+        texts = self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+        for row, text in enumerate(texts):
+            if self.finished[row]:
+                continue
+            self.generated[row] += new_tokens.shape[1]
+            hit_eos = bool((new_tokens[row] == self.tokenizer.eos_token_id).any())
+            if hit_eos or self.scanners[row].feed(text) or self.generated[row] >= self.budgets[row]:
+                self.finished[row] = True
+        return torch.tensor(self.finished, dtype=torch.bool, device=input_ids.device)
+
+    def record(self):
+        # Rows that never hit a stop condition ended on EOS or max_new_tokens
+        with _stats_lock:
+            for row, generated in enumerate(self.generated):
+                saved = self.ceiling - generated
+                DECODE_STATS["requests"] += 1
+                DECODE_STATS["tokens_generated"] += generated
+                DECODE_STATS["tokens_saved"] += saved
+                DECODE_STATS["stopped_on_sql"] += int(self.scanners[row].done)
+                print(f"Decoded {generated} tokens (budget {self.budgets[row]}), saved {saved} of {self.ceiling}")
@@ -0,0 +1,45 @@
+import sqlite3
+
+import pytest
+
+from database import ConnectionPool, PoolTimeout
+
+@pytest.fixture
+def pool(tmp_path):
+    path = str(tmp_path / "pool.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(100)])
+    conn.commit()
+    conn.close()
+    pool = ConnectionPool(path, size=2, wait_ms=100)
+    yield pool
+    pool.close()
+
+def test_slow_streams_leave_a_connection_for_queries(pool):
+    stream = pool.iter_rows("SELECT x FROM t", batch_size=10)
+    next(stream)  # the client stops reading, the stream keeps its connection
+
+    with pytest.raises(PoolTimeout):
+        next(pool.iter_rows("SELECT x FROM t"))
+    assert len(pool.fetch_all("SELECT x FROM t")) == 100
+
+    stream.close()
+    assert next(pool.iter_rows("SELECT x FROM t")) == {"columns": [{"name": "x"}]}
+
+def test_waiting_for_a_connection_times_out(pool):
+    with pool.connection(), pool.connection():
+        with pytest.raises(PoolTimeout):
+            pool.fetch_all("SELECT 1")
+
+def test_pool_leaves_the_database_file_untouched(pool):
+    with open(pool.path, "rb") as f:
+        before = f.read()
+    pool.fetch_all("SELECT x FROM t")
+    with open(pool.path, "rb") as f:
+        assert f.read() == before
+    assert pool.fetch_all("PRAGMA journal_mode") == [("delete",)]
+
+def test_a_single_connection_pool_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ConnectionPool(str(tmp_path / "pool.db"), size=1)
@@ -0,0 +1,81 @@
+import io
+import sqlite3
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from database import ConnectionPool, load_schema
+from export import ArrowBatches, arrow_stream, declared_types, first_batch, parquet_bytes
+
+def database():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE TimeEntries (entry_id INTEGER PRIMARY KEY, student_id INTEGER, hours INTEGER, task_type TEXT)")
+    conn.executemany(
+        "INSERT INTO TimeEntries (student_id, hours, task_type) VALUES (?, ?, ?)",
+        [(1, 2, "a"), (1, 3, "b"), (2, 6, "a"), (2, 7, "c")],
+    )
+    return conn
+
+def export(conn, sql):
+    cursor = conn.execute(sql)
+    columns = [{"name": column[0]} for column in cursor.description]
+    rows = cursor.fetchall()
+    _, batch = first_batch(columns, iter([{"rows": rows}]), declared_types(sql, load_schema(conn)))
+    return batch
+
+def test_aliased_aggregate_is_not_typed_as_the_table_column():
+    conn = database()
+    batch = export(conn, "SELECT student_id, AVG(hours) AS hours FROM TimeEntries GROUP BY student_id")
+    assert batch.schema.field("student_id").type == pa.int64()
+    assert batch.column(1).to_pylist() == [2.5, 6.5]
+
+def test_plain_columns_keep_declared_types_through_aliases():
+    conn = database()
+    types = declared_types("SELECT t.hours AS h, task_type FROM TimeEntries t", load_schema(conn))
+    assert types == [pa.int64(), pa.string()]
+
+def test_values_that_do_not_fit_the_declared_type_fall_back():
+    conn = database()
+    conn.execute("INSERT INTO TimeEntries (student_id, hours, task_type) VALUES (3, 'n/a', 'a')")
+    batch = export(conn, "SELECT hours FROM TimeEntries")
+    assert batch.schema.field("hours").type == pa.string()
+
+def test_later_batches_follow_the_first_batch_schema():
+    batches = ArrowBatches([{"name": "x"}], [pa.float64()])
+    batches.convert([(1.5,)])
+    assert batches.convert([(2,)]).column(0).to_pylist() == [2.0]
+
+def truncated_rows(tmp_path, max_rows):
+    path = str(tmp_path / f"export-{max_rows}.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(10)])
+    conn.commit()
+    conn.close()
+    pool = ConnectionPool(path, size=2)
+    rows = pool.iter_rows("SELECT x FROM t", batch_size=4, max_rows=max_rows)
+    return pool, next(rows)["columns"], rows
+
+def test_arrow_stream_reports_truncation_in_its_last_batch(tmp_path):
+    for max_rows, truncated in ((6, b"true"), (100, b"false")):
+        pool, columns, rows = truncated_rows(tmp_path, max_rows)
+        batches, first = first_batch(columns, rows, [None])
+        reader = pa.ipc.open_stream(b"".join(arrow_stream(batches, first, rows)))
+        received = []
+        while True:
+            try:
+                received.append(reader.read_next_batch_with_custom_metadata())
+            except StopIteration:
+                break
+        assert sum(batch.num_rows for batch, _ in received) == min(max_rows, 10)
+        last, metadata = received[-1]
+        assert last.num_rows == 0 and metadata[b"truncated"] == truncated
+        pool.close()
+
+def test_parquet_export_reports_truncation(tmp_path):
+    pool, columns, rows = truncated_rows(tmp_path, 6)
+    data, summary = parquet_bytes(columns, rows, [None])
+    assert summary["truncated"]
+    assert pq.read_metadata(io.BytesIO(data)).metadata[b"truncated"] == b"true"
+    assert pq.read_table(io.BytesIO(data)).num_rows == 6
+    pool.close()
@@ -0,0 +1,55 @@
+import sqlite3
+
+from create_db import create_scaled_database
+from index_advisor import IndexAdvisor, evaluate, recommend
+
+def database():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE Students (student_id INTEGER PRIMARY KEY, name TEXT, team_id INTEGER);
+        CREATE TABLE TimeEntries (entry_id INTEGER PRIMARY KEY, student_id INTEGER, hours INTEGER, task_type TEXT);
+    """)
+    # Keeps the inner side of a join a plain SCAN
+    conn.execute("PRAGMA automatic_index = OFF")
+    return conn
+
+def proposed(conn, sql):
+    return [(proposal["table"], proposal["columns"][0]) for proposal in recommend(conn, [(sql, 1)])]
+
+def test_join_columns_are_indexed_on_the_inner_side_only():
+    # Planned as SCAN t, then SCAN s once per row of t
+    sql = "SELECT s.name, t.hours FROM TimeEntries t JOIN Students s ON s.team_id = t.student_id"
+    assert proposed(database(), sql) == [("Students", "team_id")]
+
+def test_outer_scans_still_get_filter_indexes():
+    sql = "SELECT t.hours, s.name FROM TimeEntries t JOIN Students s ON s.student_id = t.student_id WHERE t.task_type = 'coding'"
+    assert proposed(database(), sql) == [("TimeEntries", "task_type")]
+
+def test_record_writes_the_log_off_the_caller_thread(tmp_path):
+    path = tmp_path / "queries.jsonl"
+    advisor = IndexAdvisor(log_path=str(path))
+    advisor.record("SELECT 1;", 1.5)
+    advisor.close()
+    assert path.read_text() == '{"query": "SELECT 1", "elapsed_ms": 1.5}\n'
+
+def test_evaluate_without_apply_leaves_indexes_and_statistics_alone(tmp_path):
+    path = str(tmp_path / "advisor.db")
+    create_scaled_database(path, scale=2000)
+    # No planner statistics yet, so any ANALYZE that sticks shows up
+    conn = sqlite3.connect(path)
+    conn.execute("DELETE FROM sqlite_stat1")
+    conn.commit()
+    conn.close()
+
+    def state():
+        conn = sqlite3.connect(path)
+        indexes = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' ORDER BY name").fetchall()
+        stats = conn.execute("SELECT * FROM sqlite_stat1 ORDER BY tbl, idx").fetchall()
+        conn.close()
+        return indexes, stats
+
+    before = state()
+    report = evaluate(path, [("SELECT hours FROM TimeEntries WHERE task_type = 'Testing'", 1)], repeats=1)
+    assert [proposal["table"] for proposal in report] == ["TimeEntries"]
+    assert not report[0]["applied"]
+    assert state() == before
@@ -0,0 +1,68 @@
+import os
+import sqlite3
+
+import pytest
+import torch
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+import main
+from adapters import AdapterRegistry
+from generation import build_prompt, prompt_prefix
+
+SAMPLE_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample.db")
+
+def tiny_model():
+    # Byte-level tokenizer without merges and a one-layer Llama: no downloads
+    alphabet = pre_tokenizers.ByteLevel.alphabet()
+    vocab = {token: i for i, token in enumerate(["<s>", "</s>"] + sorted(alphabet))}
+    backend = Tokenizer(models.BPE(vocab=vocab, merges=[]))
+    backend.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    backend.decoder = decoders.ByteLevel()
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=backend, bos_token="<s>", eos_token="</s>")
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=len(vocab), hidden_size=16, intermediate_size=32, num_hidden_layers=1,
+        num_attention_heads=2, num_key_value_heads=2, max_position_embeddings=4096,
+        bos_token_id=0, eos_token_id=1,
+    )
+    return LlamaForCausalLM(config).eval(), tokenizer
+
+@pytest.fixture
+def served(monkeypatch):
+    model, tokenizer = tiny_model()
+    monkeypatch.setattr(main.models, "_loaded", {
+        "model": model,
+        "tokenizer": tokenizer,
+        "adapters": AdapterRegistry(model, None, {}),
+        "draft_model": None,
+    })
+    monkeypatch.setattr(main, "SCHEMA_LINKING", True)
+    monkeypatch.setattr(main, "prefix_cache", main.PrefixCache(4))
+    conn = sqlite3.connect(SAMPLE_DB)
+    yield main.schema_catalog.refresh(conn)
+    conn.close()
+
+def generate(catalog, question):
+    schema = main.linked_schema(catalog, question)
+    main.generate_prompts([build_prompt(question, schema)], [2], prefixes=[prompt_prefix(schema)], max_new_tokens=2, do_sample=False)
+    return schema
+
+def test_linked_prompts_hit_the_prefix_cache(served):
+    first = generate(served, "What is the total hours per task type?")
+    assert first != served.text
+    assert main.prefix_cache.stats == {"hits": 0, "misses": 1, "evictions": 0}
+
+    # Same linked tables, so the same cached prefix
+    assert generate(served, "How many hours were logged per task type?") == first
+    assert main.prefix_cache.stats["hits"] == 1
+    assert main.prefix_cache.stats["misses"] == 1
+
+def test_batches_mixing_linked_schemas_use_one_prefix_each(served):
+    questions = ["What is the total hours per task type?", "List every project budget"]
+    schemas = [main.linked_schema(served, question) for question in questions]
+    assert schemas[0] != schemas[1]
+    prompts = [build_prompt(question, schema) for question, schema in zip(questions, schemas)]
+    outputs = main.generate_prompts(prompts, [2, 2], prefixes=[prompt_prefix(schema) for schema in schemas], max_new_tokens=2, do_sample=False)
+    assert len(outputs) == 2
+    assert main.prefix_cache.stats["misses"] == 2
@@ -0,0 +1,64 @@
+import asyncio
+import os
+import sqlite3
+import threading
+
+import pytest
+
+import main
+from adapters import AdapterRegistry
+from result_cache import GenerationCache
+
+SAMPLE_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample.db")
+
+class ThreadRecordingCache(GenerationCache):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = set()
+
+    def get(self, key):
+        self.threads.add(threading.get_ident())
+        return super().get(key)
+
+    def put(self, key, value):
+        self.threads.add(threading.get_ident())
+        super().put(key, value)
+
+@pytest.fixture
+def served(monkeypatch, tmp_path):
+    adapter = tmp_path / "adapter"
+    adapter.mkdir()
+    (adapter / "adapter_config.json").write_text("{}")
+    monkeypatch.setattr(main.models, "_loaded", {
+        "model_info": {"dtype": "float32"},
+        "adapters": AdapterRegistry(None, str(adapter), {}),
+    })
+    monkeypatch.setattr(main, "result_cache", ThreadRecordingCache(path=str(tmp_path / "cache.db")))
+
+    conn = sqlite3.connect(SAMPLE_DB)
+    catalog = main.schema_catalog.refresh(conn)
+    conn.close()
+
+    async def current_schema():
+        return catalog
+    monkeypatch.setattr(main, "current_schema", current_schema)
+
+def test_model_identity_does_not_touch_adapter_files(served, monkeypatch):
+    identity = main.model_identity()
+
+    def stat(path):
+        raise AssertionError(f"stat on the request path: {path}")
+    monkeypatch.setattr(os.path, "getmtime", stat)
+    monkeypatch.setattr(os.path, "exists", stat)
+    assert main.model_identity() == identity
+
+def test_persistent_cache_is_read_and_written_off_the_event_loop(served):
+    async def round_trip():
+        key, cached = await main.cache_lookup("How many students are there?")
+        assert cached is None
+        await main.cache_store(key, "SELECT COUNT(*) FROM Students")
+        return await main.cache_lookup("how many students are there")
+
+    key, cached = asyncio.run(round_trip())
+    assert cached == "SELECT COUNT(*) FROM Students"
+    assert main.result_cache.threads and threading.get_ident() not in main.result_cache.threads
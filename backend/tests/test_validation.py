@@ -0,0 +1,46 @@
+import sqlite3
+
+import pytest
+
+from create_db import create_scaled_database
+from validation import SQLValidationError, SQLValidator
+
+@pytest.fixture(scope="module")
+def scaled_db(tmp_path_factory):
+    # 2e5 time entries and 5e4 students: multiplying the two is over the limit
+    path = str(tmp_path_factory.mktemp("validation") / "scaled.db")
+    create_scaled_database(path, scale=2e5)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    yield conn
+    conn.close()
+
+@pytest.mark.parametrize("sql", [
+    "SELECT (SELECT COUNT(*) FROM TimeEntries), (SELECT COUNT(*) FROM Students)",
+    "SELECT name FROM Students UNION SELECT task_type FROM TimeEntries",
+    "SELECT COUNT(*) FROM TimeEntries WHERE hours > (SELECT AVG(grade) FROM Students)",
+])
+def test_separate_subqueries_add_up(scaled_db, sql):
+    cost = SQLValidator(1e9).validate(scaled_db, sql)["cost"]
+    assert cost == 2e5 + 5e4
+
+def test_nested_loops_still_multiply(scaled_db):
+    with pytest.raises(SQLValidationError, match="estimated cost"):
+        SQLValidator(1e9).validate(scaled_db, "SELECT COUNT(*) FROM TimeEntries t JOIN Students s ON t.hours > s.grade")
+
+def test_correlated_subquery_runs_per_outer_row(scaled_db):
+    sql = ("SELECT s.name FROM Students s "
+           "WHERE s.grade > (SELECT AVG(t.hours) FROM TimeEntries t WHERE t.hours > s.grade)")
+    with pytest.raises(SQLValidationError, match="estimated cost"):
+        SQLValidator(1e9).validate(scaled_db, sql)
+
+def test_row_counts_follow_a_rebuilt_database(tmp_path):
+    path = str(tmp_path / "rebuilt.db")
+    create_scaled_database(path, scale=1000)
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    validator = SQLValidator(1e9)
+    assert validator.row_count(conn, "TimeEntries") == 1000
+
+    # e.g. create_db.py --scale run again under a live server
+    create_scaled_database(path, scale=4000)
+    assert validator.row_count(conn, "TimeEntries") == 4000
+    conn.close()
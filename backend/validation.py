@@ -0,0 +1,172 @@
+import math
+import sqlite3
+import threading
+from typing import Optional
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+from sqlglot.optimizer.qualify import qualify
+
+from database import load_schema
+
+READ_ONLY = (exp.Select, exp.Union, exp.Intersect, exp.Except)
+
+class SQLValidationError(ValueError):
+    pass
+
+def parse_select(sql: str) -> exp.Expression:
+    try:
+        statements = [statement for statement in sqlglot.parse(sql, read="sqlite") if statement is not None]
+    except SqlglotError as e:
+        raise SQLValidationError(f"could not parse query: {str(e).splitlines()[0]}")
+    if len(statements) != 1:
+        raise SQLValidationError("expected exactly one SQL statement")
+    if not isinstance(statements[0], READ_ONLY):
+        raise SQLValidationError(f"only SELECT queries are allowed, got {statements[0].key.upper()}")
+    return statements[0]
+
+def check_tables(tree: exp.Expression, schema: dict):
+    known = {table.lower() for table in schema}
+    known |= {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    for table in tree.find_all(exp.Table):
+        if table.name and table.name.lower() not in known:
+            raise SQLValidationError(f"no such table: {table.name}")
+
+def find_cartesian(select: exp.Select):
+    # Sources of this SELECT joined by column predicates must form one connected group
+    sources = []
+    # Newer sqlglot releases store FROM under "from_"
+    source = select.args.get("from") or select.args.get("from_")
+    if source:
+        sources.append(source.this)
+    joins = select.args.get("joins") or []
+    sources.extend(join.this for join in joins)
+    aliases = [source.alias_or_name.lower() for source in sources]
+    if len(aliases) < 2:
+        return None
+
+    parent = {alias: alias for alias in aliases}
+    def find(alias):
+        while parent[alias] != alias:
+            alias = parent[alias]
+        return alias
+
+    conditions = [select.args.get("where")] + [join.args.get("on") for join in joins]
+    for join in joins:
+        if join.args.get("using"):
+            # USING joins the new source to whatever came before it
+            parent[find(join.this.alias_or_name.lower())] = find(aliases[0])
+
+    for condition in filter(None, conditions):
+        for predicate in condition.find_all(exp.Binary):
+            if predicate.find_ancestor(exp.Select) is not select:
+                continue
+            tables = {column.table.lower() for column in predicate.find_all(exp.Column) if column.table}
+            tables = [table for table in tables if table in parent]
+            for table in tables[1:]:
+                parent[find(table)] = find(tables[0])
+
+    groups = {find(alias) for alias in aliases}
+    if len(groups) > 1:
+        return sorted(groups)
+    return None
+
+class SQLValidator:
+    """Rejects generated SQL before it reaches the database.
+
+    Checks, in order: one SELECT statement, known tables and columns, no
+    Cartesian products, a valid SQLite plan, and a plan cost under ``max_cost``.
+    """
+
+    def __init__(self, max_cost: float = 1e9):
+        self.max_cost = max_cost
+        self._row_counts = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def row_count(self, conn: sqlite3.Connection, table: str) -> int:
+        # Counted once per database version, like SchemaCatalog: create_db.py
+        # drops and recreates the tables, so rebuilding under a running server recounts
+        version = (conn.execute("PRAGMA database_list").fetchone()[2], conn.execute("PRAGMA schema_version").fetchone()[0])
+        with self._lock:
+            if version != self._version:
+                self._row_counts.clear()
+                self._version = version
+            if table not in self._row_counts:
+                self._row_counts[table] = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+            return self._row_counts[table]
+
+    def loop_factor(self, conn: sqlite3.Connection, detail: str, tables: dict, aliases: dict) -> Optional[float]:
+        # A SCAN reads the whole table, a SEARCH about log2(rows); None for anything else
+        words = detail.split()
+        if len(words) < 2 or words[0] not in ("SCAN", "SEARCH"):
+            return None
+        name = words[2] if words[1] == "TABLE" else words[1]
+        if len(words) > 3 and words[-2] == "AS":
+            name = words[-1]
+        table = aliases.get(name.lower()) or tables.get(name.lower())
+        if table is None:
+            return None
+        rows = max(1, self.row_count(conn, table))
+        return rows if words[0] == "SCAN" else max(1.0, math.log2(rows))
+
+    def estimate_cost(self, conn: sqlite3.Connection, sql: str, tree: exp.Expression, schema: dict) -> float:
+        """Estimated row reads, from the EXPLAIN QUERY PLAN tree.
+
+        The SCAN/SEARCH loops of one SELECT are nested, so they multiply.
+        Subqueries and compound (UNION, ...) branches run separately, so
+        their costs add; a correlated subquery runs once per outer row.
+        """
+        tables = {table.lower(): table for table in schema}
+        aliases = {table.alias_or_name.lower(): tables.get(table.name.lower()) for table in tree.find_all(exp.Table)}
+        children = {}
+        for node, parent, _, detail in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+            children.setdefault(parent, []).append((node, detail))
+
+        def scope_cost(parent: int) -> float:
+            loops, subqueries = [], []
+            for node, detail in children.get(parent, []):
+                if detail.startswith("MULTI-INDEX OR"):
+                    # One loop level made of several index searches
+                    loops.append(max(1.0, scope_cost(node)))
+                    continue
+                factor = self.loop_factor(conn, detail, tables, aliases)
+                if factor is not None:
+                    loops.append(factor)
+                elif node in children:
+                    subqueries.append((detail, scope_cost(node)))
+            outer_rows = math.prod(loops)
+            cost = float(outer_rows) if loops else 0.0
+            for detail, sub_cost in subqueries:
+                cost += sub_cost * outer_rows if detail.startswith("CORRELATED") else sub_cost
+            return cost
+
+        return max(1.0, scope_cost(0))
+
+    def validate(self, conn: sqlite3.Connection, sql: str, schema: Optional[dict] = None) -> dict:
+        # Callers with a cached schema (see SchemaCatalog) skip the PRAGMA scan
+        tree = parse_select(sql)
+        schema = schema if schema is not None else load_schema(conn)
+        check_tables(tree, schema)
+        try:
+            tree = qualify(tree, schema=schema, dialect="sqlite", quote_identifiers=False)
+        except SqlglotError as e:
+            raise SQLValidationError(str(e))
+
+        for select in tree.find_all(exp.Select):
+            groups = find_cartesian(select)
+            if groups:
+                raise SQLValidationError(
+                    f"Cartesian product between {', '.join(groups)}: add a join condition"
+                )
+
+        try:
+            cost = self.estimate_cost(conn, sql, tree, schema)
+        except sqlite3.Error as e:
+            raise SQLValidationError(f"SQLite error: {str(e)}")
+        if cost > self.max_cost:
+            raise SQLValidationError(
+                f"estimated cost {cost:.3g} row reads is over the {self.max_cost:.3g} limit; add filters or joins"
+            )
+        return {"cost": cost}
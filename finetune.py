@@ -0,0 +1,242 @@
+import argparse
+import copy
+import dataclasses
+import json
+import os
+import statistics
+import time
+
+import torch
+import yaml
+from datasets import load_dataset
+from transformers import (
+    AutoModelForCausalLM,
+    AutoTokenizer,
+    BitsAndBytesConfig,
+    TrainerCallback,
+    TrainingArguments,
+)
+from peft import LoraConfig, get_peft_model, prepare_model_for_kbit_training
+
+from token_batching import TokenBudgetBatchSampler, TokenBudgetTrainer
+from training_data import TEMPLATES, PackedCollator, packed_dataset
+
+# Settings shared by every config; a config file only lists what it changes
+DEFAULTS = {
+    "model_id": None,
+    "dataset": "xlangai/spider",
+    "template": "spider",
+    "save_dir": "sql-assistant-final",
+    "max_length": 2048,
+    "packing": True,
+    "length_bucketing": False,
+    # Batches of similar-length examples up to this many padded tokens, in
+    # place of per_device_train_batch_size; most useful with packing off
+    "max_tokens_per_batch": None,
+    "cache_dir": "./data_cache",
+    "load_in_4bit": True,
+    "lora": {
+        "r": 64,
+        "lora_alpha": 16,
+        "lora_dropout": 0.1,
+        "target_modules": ["q_proj", "v_proj", "k_proj", "o_proj", "gate_proj", "up_proj", "down_proj"],
+    },
+    # Passed to TrainingArguments as-is
+    "training": {
+        "output_dir": "./sql-assistant",
+        "num_train_epochs": 3,
+        "per_device_train_batch_size": 4,
+        "gradient_accumulation_steps": 4,
+        "gradient_checkpointing": True,
+        "dataloader_num_workers": 0,
+        "optim": "paged_adamw_32bit",
+        "logging_steps": 10,
+        "learning_rate": 2e-4,
+        "fp16": True,
+        "max_grad_norm": 0.3,
+        "warmup_ratio": 0.03,
+        "lr_scheduler_type": "cosine",
+        "save_strategy": "epoch",
+        "report_to": [],
+    },
+}
+
+def merge(base: dict, override: dict) -> dict:
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+def read_config(path: str) -> dict:
+    if path.endswith(".toml"):
+        import tomllib
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+def apply_override(config: dict, assignment: str):
+    # "training.per_device_train_batch_size=8"; the value is parsed as YAML
+    key, _, value = assignment.partition("=")
+    *parents, leaf = key.split(".")
+    node = config
+    for parent in parents:
+        node = node.setdefault(parent, {})
+    parsed = yaml.safe_load(value)
+    if isinstance(parsed, str):
+        # YAML reads 1e-4 (no decimal point) as a string
+        try:
+            parsed = float(parsed)
+        except ValueError:
+            pass
+    node[leaf] = parsed
+
+def load_config(path: str, overrides: list) -> dict:
+    config = merge(DEFAULTS, read_config(path))
+    for assignment in overrides:
+        apply_override(config, assignment)
+    if not config["model_id"]:
+        raise ValueError(f"{path} does not set model_id")
+    if config["template"] not in TEMPLATES:
+        raise ValueError(f"unknown template '{config['template']}', expected one of {', '.join(TEMPLATES)}")
+    return config
+
+def training_arguments(config: dict) -> TrainingArguments:
+    training = dict(config["training"])
+    # The collator needs the raw input_ids and position_ids columns
+    training.setdefault("remove_unused_columns", False)
+    # Older and newer transformers releases spell some of these differently
+    fields = {field.name for field in dataclasses.fields(TrainingArguments)}
+    if "warmup_ratio" in training and "warmup_ratio" not in fields:
+        training["warmup_steps"] = training.pop("warmup_ratio")
+    if config["length_bucketing"] and not config["max_tokens_per_batch"]:
+        if "train_sampling_strategy" in fields:
+            training["train_sampling_strategy"] = "group_by_length"
+        else:
+            training["group_by_length"] = True
+    return TrainingArguments(**training)
+
+class StepTimer(TrainerCallback):
+    """Times optimizer steps, skipping the first few while kernels and caches warm up."""
+
+    def __init__(self, warmup_steps: int = 3):
+        self.warmup_steps = warmup_steps
+        self.step_times = []
+        self._start = None
+
+    def on_step_begin(self, args, state, control, **kwargs):
+        self._start = time.perf_counter()
+
+    def on_step_end(self, args, state, control, **kwargs):
+        # CUDA kernels run asynchronously; wait for them so the step is really over
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        if state.global_step > self.warmup_steps:
+            self.step_times.append(time.perf_counter() - self._start)
+
+    def summary(self, batch_stats: dict, steps: int) -> dict:
+        if not self.step_times or not steps:
+            return {"timed_steps": 0}
+        mean = statistics.mean(self.step_times)
+        # Per-step averages come from all steps, warm-up included
+        summary = {
+            "timed_steps": len(self.step_times),
+            "mean_step_s": round(mean, 4),
+            "median_step_s": round(statistics.median(self.step_times), 4),
+            "tokens_per_step": round(batch_stats["tokens"] / steps, 1),
+            "tokens_per_s": round(batch_stats["tokens"] / steps / mean, 1),
+            "sequences_per_s": round(batch_stats["sequences"] / steps / mean, 2),
+            "padding_ratio": round(1 - batch_stats["tokens"] / batch_stats["padded_tokens"], 4),
+        }
+        if torch.cuda.is_available():
+            summary["peak_memory_gb"] = round(torch.cuda.max_memory_allocated() / 1024**3, 2)
+        return summary
+
+def load_model(config: dict):
+    quantization_config = None
+    if config["load_in_4bit"]:
+        quantization_config = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_compute_dtype=torch.float16,
+            bnb_4bit_use_double_quant=True,
+        )
+    model = AutoModelForCausalLM.from_pretrained(
+        config["model_id"],
+        quantization_config=quantization_config,
+        device_map="auto",
+        trust_remote_code=True,
+    )
+    tokenizer = AutoTokenizer.from_pretrained(config["model_id"], trust_remote_code=True)
+    tokenizer.pad_token = tokenizer.eos_token
+
+    if config["load_in_4bit"]:
+        model = prepare_model_for_kbit_training(model)
+    # Packed examples are told apart by position_ids, which only happens without a KV cache
+    model.config.use_cache = False
+
+    peft_config = LoraConfig(bias="none", task_type="CAUSAL_LM", **config["lora"])
+    model = get_peft_model(model, peft_config)
+    return model, tokenizer
+
+def main():
+    parser = argparse.ArgumentParser(description="Finetune a LoRA SQL adapter from a YAML or TOML config")
+    parser.add_argument("config", help="e.g. configs/llama_3.2_3b.yaml")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a config value, e.g. --set training.per_device_train_batch_size=8")
+    parser.add_argument("--max-steps", type=int, help="stop after this many optimizer steps, for step time sweeps")
+    parser.add_argument("--timing-warmup", type=int, default=3, help="steps left out of the step time summary")
+    parser.add_argument("--report", help="append the resolved config and step timings to this .jsonl file")
+    parser.add_argument("--no-save", action="store_true", help="skip saving the final adapter")
+    args = parser.parse_args()
+
+    overrides = list(args.set)
+    if args.max_steps:
+        overrides.append(f"training.max_steps={args.max_steps}")
+    config = load_config(args.config, overrides)
+    print(json.dumps(config, indent=2))
+
+    model, tokenizer = load_model(config)
+    model.print_trainable_parameters()
+
+    dataset = load_dataset(config["dataset"])
+    name = os.path.splitext(os.path.basename(args.config))[0]
+    train_dataset = packed_dataset(
+        dataset["train"],
+        tokenizer,
+        TEMPLATES[config["template"]],
+        name,
+        max_length=config["max_length"],
+        cache_dir=config["cache_dir"],
+        pack=config["packing"],
+    )
+
+    training_args = training_arguments(config)
+    batch_sampler = None
+    if config["max_tokens_per_batch"]:
+        batch_sampler = TokenBudgetBatchSampler(train_dataset["length"], config["max_tokens_per_batch"], seed=training_args.seed)
+    timer = StepTimer(args.timing_warmup)
+    trainer = TokenBudgetTrainer(
+        model=model,
+        train_dataset=train_dataset,
+        args=training_args,
+        data_collator=PackedCollator(tokenizer.pad_token_id),
+        callbacks=[timer],
+        batch_sampler=batch_sampler,
+    )
+    trainer.train()
+
+    summary = timer.summary(trainer.batch_stats, trainer.state.global_step)
+    print(f"Step timing: {json.dumps(summary)}")
+    if args.report:
+        with open(args.report, "a") as f:
+            f.write(json.dumps({"config": args.config, "overrides": args.set, "resolved": config, **summary}) + "\n")
+
+    if not args.no_save:
+        trainer.save_model(config["save_dir"])
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,39 @@ import React, { useState } from 'react';
 import axios from 'axios';
 import './App.css';
 
+// Reads a text/event-stream body and calls onEvent(event, data) for each message
+async function readEvents(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    const messages = buffer.split('\n\n');
+    buffer = messages.pop();
+    for (const message of messages) {
+      let event = 'message';
+      let data = '';
+      for (const line of message.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      }
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
+}
+
 function App() {
   const [question, setQuestion] = useState('');
   const [sqlQuery, setSqlQuery] = useState('');
   const [editableSqlQuery, setEditableSqlQuery] = useState('');
   const [results, setResults] = useState(null);
+  const [columns, setColumns] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [truncated, setTruncated] = useState(false);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
   const [feedbackLoop, setFeedbackLoop] = useState(false);
@@ -18,33 +46,66 @@ function App() {
     setResults(null);
 
     try {
-      // Get SQL query with optional error feedback
-      const queryResponse = await axios.post('http://localhost:8000/query', {
-        question: question,
-        previous_error: includeError ? error : null,
-        previous_query: includeError ? editableSqlQuery : null
+      // Stream the SQL as it is generated, with optional error feedback
+      const response = await fetch('http://localhost:8000/query/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          question: question,
+          previous_error: includeError ? error : null,
+          previous_query: includeError ? editableSqlQuery : null
+        })
+      });
+      if (!response.ok) {
+        const body = await response.json().catch(() => ({}));
+        throw new Error(body.detail || 'An error occurred during generation');
+      }
+
+      let generatedQuery = '';
+      let validationError = null;
+      await readEvents(response, (event, data) => {
+        if (event === 'token') {
+          generatedQuery += data.text;
+          setSqlQuery(generatedQuery);
+          setEditableSqlQuery(generatedQuery);
+        } else if (event === 'done') {
+          generatedQuery = data.sql_query;
+          validationError = data.validation_error;
+        } else if (event === 'error') {
+          throw new Error(data.detail);
+        }
       });
-      const generatedQuery = queryResponse.data.sql_query;
       setSqlQuery(generatedQuery);
       setEditableSqlQuery(generatedQuery);
-      setFeedbackLoop(false); // Reset feedback loop if successful
+      if (validationError) {
+        // Offer the usual retry-with-feedback for SQL the server would reject
+        setError(`Validation error: ${validationError}`);
+        setFeedbackLoop(true);
+      } else {
+        setFeedbackLoop(false); // Reset feedback loop if successful
+      }
     } catch (err) {
-      setError(err.response?.data?.detail || 'An error occurred during generation');
+      setError(err.message || 'An error occurred during generation');
       setFeedbackLoop(true);
     } finally {
       setLoading(false);
     }
   };
 
-  const handleExecute = async () => {
+  const handleExecute = async (cursor = null) => {
     setLoading(true);
     setError('');
-    setResults(null);
+    if (!cursor) setResults(null);
     try {
       const response = await axios.post('http://localhost:8000/execute-query', {
-        query: editableSqlQuery
+        query: editableSqlQuery,
+        cursor: cursor
       });
-      setResults(response.data.results);
+      // Later pages are appended to the rows already shown
+      setResults((previous) => (cursor && previous ? previous.concat(response.data.results) : response.data.results));
+      setColumns(response.data.columns || []);
+      setNextCursor(response.data.next_cursor);
+      setTruncated(response.data.truncated);
       setFeedbackLoop(false);
     } catch (err) {
       setError(err.response?.data?.detail || 'An error occurred');
@@ -105,7 +166,7 @@ function App() {
                 rows={5}
               />
               <button
-                onClick={handleExecute}
+                onClick={() => handleExecute()}
                 className="execute-button"
                 disabled={loading}
               >
@@ -121,6 +182,15 @@ function App() {
             <div className="results-table">
               {results.length > 0 ? (
                 <table>
+                  {columns.length > 0 && (
+                    <thead>
+                      <tr>
+                        {columns.map((column, j) => (
+                          <th key={j}>{column.name}</th>
+                        ))}
+                      </tr>
+                    </thead>
+                  )}
                   <tbody>
                     {results.map((row, i) => (
                       <tr key={i}>
@@ -135,6 +205,18 @@ function App() {
                 <p>No results found</p>
               )}
             </div>
+            {nextCursor && (
+              <button
+                onClick={() => handleExecute(nextCursor)}
+                className="execute-button"
+                disabled={loading}
+              >
+                {loading ? 'Loading...' : 'Load More'}
+              </button>
+            )}
+            {truncated && (
+              <p>Showing the first {results.length} rows; the rest were cut off by the server's row limit.</p>
+            )}
           </section>
         )}
       </main>
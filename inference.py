@@ -1,25 +1,22 @@
-import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
-from peft import PeftModel
+import os
+import sys
+
+# Shares the model loading code with the API server
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from model_loading import load_model as load_model_with_precision
 
 def load_model():
     # Load base model and tokenizer
     base_model_id = "meta-llama/Llama-3.2-1B-Instruct"
     adapter_path = "./sql-assistant-final"
-    
-    # Load tokenizer
-    tokenizer = AutoTokenizer.from_pretrained(base_model_id)
-    
-    # Load base model with same 4-bit quantization
-    model = AutoModelForCausalLM.from_pretrained(
-        base_model_id,
-        device_map="auto",
-        torch_dtype=torch.float16,
-    )
-    
-    # Load adapter weights
-    model = PeftModel.from_pretrained(model, adapter_path)
-    
+
+    # fp16, int8, nf4 or cpu-int8
+    precision = os.environ.get("INFERENCE_PRECISION", "fp16")
+    # auto uses CUDA when present and falls back to the CPU otherwise
+    device = os.environ.get("DEVICE", "auto")
+    model, tokenizer, info = load_model_with_precision(base_model_id, adapter_path, precision, device)
+    print(f"Loaded {precision} model on {info['device']} in {info['load_seconds']}s ({info['footprint_mb']} MB of weights)")
+
     return model, tokenizer
 
 def generate_sql(question, model, tokenizer):
@@ -85,7 +82,7 @@ Question: {question}
 Write a SQL query to answer this question. Use only the tables and columns defined in the schema above. [/INST]
 """
     
-    inputs = tokenizer(prompt, return_tensors="pt").to("cuda")
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
     
     outputs = model.generate(
         **inputs,
@@ -0,0 +1,115 @@
+import random
+from typing import Iterator, List, Optional
+
+import torch
+from torch.utils.data import DataLoader
+from transformers import Trainer
+
+def sequence_lengths(position_ids: torch.Tensor) -> torch.Tensor:
+    """Unpadded length of each row of a PackedCollator batch.
+
+    Padding sits at position 0 after the last real token, and every example
+    is at least BOS + EOS, so a row ends at its last nonzero position.
+    """
+    return position_ids.ne(0).flip(-1).cumsum(-1).ne(0).sum(-1)
+
+class TokenBudgetBatchSampler:
+    """Batches examples of similar length up to ``max_tokens`` padded tokens.
+
+    A batch costs rows times its longest row, so examples are sorted by
+    length (ties in a random order) and cut greedily. Batch boundaries only
+    depend on the sorted lengths, so every epoch has the same number of
+    batches; their composition and order are reshuffled each epoch.
+    """
+
+    def __init__(self, lengths: List[int], max_tokens: int, max_batch_size: Optional[int] = None, shuffle: bool = True, seed: int = 0):
+        if max(lengths) > max_tokens:
+            raise ValueError(f"an example has {max(lengths)} tokens, more than max_tokens={max_tokens}")
+        self.lengths = list(lengths)
+        self.max_tokens = max_tokens
+        self.max_batch_size = max_batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self._num_batches = len(self._batches(sorted(range(len(self.lengths)), key=self.lengths.__getitem__)))
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def _batches(self, order: List[int]) -> List[List[int]]:
+        batches, batch, longest = [], [], 0
+        for index in order:
+            length = self.lengths[index]
+            full = self.max_batch_size is not None and len(batch) >= self.max_batch_size
+            if batch and (max(longest, length) * (len(batch) + 1) > self.max_tokens or full):
+                batches.append(batch)
+                batch, longest = [], 0
+            batch.append(index)
+            longest = max(longest, length)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def __iter__(self) -> Iterator[List[int]]:
+        rng = random.Random(self.seed + self.epoch)
+        order = list(range(len(self.lengths)))
+        if self.shuffle:
+            rng.shuffle(order)
+        # sort is stable, so equal lengths keep the shuffled order
+        order.sort(key=self.lengths.__getitem__)
+        batches = self._batches(order)
+        if self.shuffle:
+            rng.shuffle(batches)
+        self.epoch += 1
+        return iter(batches)
+
+    def __len__(self) -> int:
+        return self._num_batches
+
+class TokenBudgetTrainer(Trainer):
+    """Trainer that can take a batch sampler and logs tokens per optimizer step.
+
+    Micro-batches then vary in size, so the loss must be normalized by the
+    label tokens of the whole accumulation window rather than averaged per
+    micro-batch. Trainer does that itself when the model forward accepts
+    loss kwargs (num_items_in_batch), which is checked here.
+    """
+
+    def __init__(self, *args, batch_sampler: Optional[TokenBudgetBatchSampler] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_sampler = batch_sampler
+        if batch_sampler is not None and not getattr(self, "model_accepts_loss_kwargs", False):
+            print("Warning: this model or transformers release averages the loss per micro-batch, "
+                  "so short batches are over-weighted under gradient accumulation")
+        self.batch_stats = {"tokens": 0, "padded_tokens": 0, "sequences": 0}
+        self._window = dict(self.batch_stats)
+        self._window_start_step = 0
+
+    def get_train_dataloader(self) -> DataLoader:
+        if self.batch_sampler is None:
+            return super().get_train_dataloader()
+        dataloader = DataLoader(
+            self.train_dataset,
+            batch_sampler=self.batch_sampler,
+            collate_fn=self.data_collator,
+            num_workers=self.args.dataloader_num_workers,
+            pin_memory=self.args.dataloader_pin_memory,
+        )
+        return self.accelerator.prepare(dataloader)
+
+    def training_step(self, model, inputs, num_items_in_batch=None):
+        tokens = int(sequence_lengths(inputs["position_ids"]).sum())
+        for stats in (self.batch_stats, self._window):
+            stats["tokens"] += tokens
+            stats["padded_tokens"] += inputs["input_ids"].numel()
+            stats["sequences"] += inputs["input_ids"].shape[0]
+        return super().training_step(model, inputs, num_items_in_batch)
+
+    def log(self, logs: dict, start_time: Optional[float] = None):
+        steps = self.state.global_step - self._window_start_step
+        if "loss" in logs and steps > 0 and self._window["padded_tokens"]:
+            logs["tokens_per_step"] = round(self._window["tokens"] / steps, 1)
+            logs["padding_ratio"] = round(1 - self._window["tokens"] / self._window["padded_tokens"], 4)
+            self._window = dict.fromkeys(self._window, 0)
+            self._window_start_step = self.state.global_step
+        super().log(logs, start_time)
@@ -0,0 +1,158 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+
+import torch
+from datasets import load_from_disk
+
+# Prompt templates of the finetune configs, by name
+def format_spider(example):
+    return {
+        "text": f"""[INST]Convert this question to SQL:
+{example['question']}[/INST]
+{example['query']}"""
+    }
+
+def format_spider_fenced(example):
+    return {
+        "text": f"""[INST]Question: {example['question']}[/INST]
+```sql
+{example['sql']}
+```
+"""
+    }
+
+def format_gretel(example):
+    return {
+        "text": f"""[INST]SQL Context: {example['sql_context']}
+Question: {example['sql_prompt']}[/INST]
+```sql
+{example['sql']}
+```
+"""
+    }
+
+TEMPLATES = {"spider": format_spider, "spider_fenced": format_spider_fenced, "gretel": format_gretel}
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    # The full vocabulary and merges, not just the model name, decide the token ids
+    if getattr(tokenizer, "is_fast", False):
+        state = tokenizer.backend_tokenizer.to_str()
+    else:
+        state = json.dumps(sorted(tokenizer.get_vocab().items()))
+    state += f"|{tokenizer.bos_token_id}|{tokenizer.eos_token_id}"
+    return hashlib.sha256(state.encode()).hexdigest()[:16]
+
+def template_fingerprint(format_fn) -> str:
+    try:
+        source = inspect.getsource(format_fn).encode()
+    except (OSError, TypeError):
+        # Functions defined interactively have no source file
+        source = format_fn.__code__.co_code + repr(format_fn.__code__.co_consts).encode()
+    return hashlib.sha256(source).hexdigest()[:16]
+
+def tokenize_batch(batch: dict, tokenizer, format_fn, max_length: int) -> dict:
+    # Batched map hands over columns; the template takes one example at a time
+    examples = [dict(zip(batch, values)) for values in zip(*batch.values())]
+    texts = [format_fn(example)["text"] for example in examples]
+    input_ids = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=max_length - 1).input_ids
+    input_ids = [ids + [tokenizer.eos_token_id] for ids in input_ids]
+    return {"input_ids": input_ids, "position_ids": [list(range(len(ids))) for ids in input_ids]}
+
+def pack_batch(batch: dict, max_length: int) -> dict:
+    """Concatenates examples into sequences of at most ``max_length`` tokens.
+
+    position_ids restart at 0 for every example, which is how the attention
+    implementations in transformers find the boundaries between packed examples.
+    """
+    packs = {"input_ids": [], "position_ids": []}
+    input_ids, position_ids = [], []
+    for ids in batch["input_ids"]:
+        if input_ids and len(input_ids) + len(ids) > max_length:
+            packs["input_ids"].append(input_ids)
+            packs["position_ids"].append(position_ids)
+            input_ids, position_ids = [], []
+        input_ids += ids
+        position_ids += range(len(ids))
+    if input_ids:
+        packs["input_ids"].append(input_ids)
+        packs["position_ids"].append(position_ids)
+    return packs
+
+def add_length(batch: dict) -> dict:
+    # Read by length-grouped samplers instead of decoding every row
+    return {"length": [len(ids) for ids in batch["input_ids"]]}
+
+def packed_dataset(dataset, tokenizer, format_fn, name: str, max_length: int = 2048, cache_dir: str = "./data_cache", num_proc: int = None, pack: bool = True):
+    """Tokenizes and packs ``dataset`` once, then memory-maps the cached Arrow files.
+
+    The cache key covers the source dataset, tokenizer, template source,
+    sequence length and packing, so changing any of them builds a new cache.
+    With ``pack=False`` every example stays its own sequence.
+    """
+    key = hashlib.sha256(
+        f"{dataset._fingerprint}|{tokenizer_fingerprint(tokenizer)}|{template_fingerprint(format_fn)}|{max_length}|{pack}".encode()
+    ).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"{name}-{key}")
+    if os.path.exists(path):
+        print(f"Loading packed dataset from {path}")
+        return load_from_disk(path)
+
+    num_proc = num_proc or os.cpu_count()
+    tokenized = dataset.map(
+        tokenize_batch,
+        batched=True,
+        num_proc=num_proc,
+        remove_columns=dataset.column_names,
+        fn_kwargs={"tokenizer": tokenizer, "format_fn": format_fn, "max_length": max_length},
+        desc="Tokenizing",
+    )
+    packed = tokenized
+    if pack:
+        # Large map batches leave little room unused at the end of each batch's last pack
+        packed = tokenized.map(
+            pack_batch,
+            batched=True,
+            batch_size=10_000,
+            num_proc=num_proc,
+            remove_columns=tokenized.column_names,
+            fn_kwargs={"max_length": max_length},
+            desc="Packing",
+        )
+    packed = packed.map(add_length, batched=True, num_proc=num_proc, desc="Measuring")
+
+    # Write to a temporary directory first so an interrupted run never leaves a half cache
+    partial = path + ".partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    packed.save_to_disk(partial)
+    os.replace(partial, path)
+    tokens = sum(len(ids) for ids in tokenized["input_ids"])
+    print(f"Tokenized {len(tokenized)} examples ({tokens} tokens) into {len(packed)} sequences of up to {max_length} tokens")
+    return load_from_disk(path)
+
+class PackedCollator:
+    """Pads packed sequences to the longest in the batch and builds the labels.
+
+    No attention mask is passed, so the model derives per-example attention
+    from position_ids. The first token of each example and all padding are
+    excluded from the loss, so no example learns to predict the next one.
+    """
+
+    def __init__(self, pad_token_id: int):
+        self.pad_token_id = pad_token_id
+
+    def __call__(self, features: list) -> dict:
+        width = max(len(feature["input_ids"]) for feature in features)
+        input_ids = torch.full((len(features), width), self.pad_token_id, dtype=torch.long)
+        position_ids = torch.zeros((len(features), width), dtype=torch.long)
+        labels = torch.full((len(features), width), -100, dtype=torch.long)
+        for row, feature in enumerate(features):
+            length = len(feature["input_ids"])
+            input_ids[row, :length] = torch.tensor(feature["input_ids"])
+            position_ids[row, :length] = torch.tensor(feature["position_ids"])
+            labels[row, :length] = input_ids[row, :length]
+        # Padding keeps position 0, so each pad token is its own one-token sequence
+        labels[position_ids == 0] = -100
+        return {"input_ids": input_ids, "position_ids": position_ids, "labels": labels}